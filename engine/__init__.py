@@ -0,0 +1 @@
+"""Shared runtime pieces used by main.py and the levels."""
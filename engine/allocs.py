@@ -0,0 +1,328 @@
+"""Per-frame allocation tracking.
+
+Most of the worst stalls come from allocating in the hot loop: a Surface
+per flare frame or per overlay, a Rect per collision query, a list copy of
+the plasmas, a scaled image per spawn. This runs a level headless (same
+scripted input as engine.bench) and, for every frame after a warm-up:
+
+- counts Surfaces and Rects created, by call site. The counters wrap the
+  pygame calls that create them (pygame.Surface and pygame.Rect,
+  pygame.transform.*, pygame.image.load, Font.render,
+  surfarray.make_surface) and watch the Surface methods that return a new
+  one (copy, convert, convert_alpha, subsurface); a Surface's pixels are
+  allocated by SDL, so tracemalloc alone would not see them;
+- measures with tracemalloc the Python memory the frame churned through
+  (peak above the frame's starting point) and what it kept (net growth),
+  and diffs a snapshot from the end of the warm-up with one from the end
+  of the run to attribute what was kept to the game's lines;
+- flags frames over the allocation budget.
+
+    python -m engine.allocs --level lvl1 --frames 1200 --warmup 300
+    python -m engine.allocs --level lvl3 --budget-kb 32 --top 20 --out allocs.json
+
+Call sites are reported as the innermost line in levels/ (or, failing
+that, in engine/), so a Surface made by engine.flare for lvl1's
+solar_flare_animation shows up under lvl1.py. The target is zero
+Surfaces per steady-state frame. Tracking slows the game down a lot;
+frame times under it mean nothing.
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEVELS_DIR = os.path.join(ROOT, "levels") + os.sep
+ENGINE_DIR = os.path.join(ROOT, "engine") + os.sep
+MAIN_PATH = os.path.join(ROOT, "main.py")
+
+# module path -> functions in it that return a new Surface
+SURFACE_FUNCTIONS = {
+    "pygame.transform": ("scale", "smoothscale", "scale_by", "smoothscale_by", "rotate", "rotozoom",
+                         "flip", "scale2x", "laplacian", "chop"),
+    "pygame.image": ("load", "frombuffer", "frombytes", "fromstring"),
+    "pygame.surfarray": ("make_surface",),
+}
+# Surface methods that return a new Surface
+SURFACE_METHODS = frozenset(("copy", "convert", "convert_alpha", "subsurface"))
+DEFAULT_BUDGET_KB = 64
+TRACE_DEPTH = 12
+
+
+def call_site(frame):
+    """"file:line function" of the innermost game frame above frame."""
+    fallback = None
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(LEVELS_DIR) or path == MAIN_PATH:
+            return _site(path, frame.f_lineno, frame.f_code.co_name)
+        if fallback is None and path.startswith(ENGINE_DIR) and path != __file__:
+            fallback = _site(path, frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return fallback or "<outside the game>"
+
+
+def _site(path, line, function):
+    return f"{os.path.relpath(path, ROOT)}:{line} {function}"
+
+
+class CreationCounter:
+    """Counts Surface and Rect creations by call site while installed.
+
+    Replaces pygame.Surface, pygame.Rect and pygame.font.Font with counting
+    subclasses and wraps the module functions in SURFACE_FUNCTIONS. Objects
+    made through them are still instances of the pygame classes, but
+    Surfaces made by pygame's C code (image.load, transform.*, the display)
+    are not instances of the counting subclass. Methods cannot be patched
+    on pygame's built-in Surface type either, so calls to SURFACE_METHODS
+    are caught with a profile hook (sys.setprofile sees every C call) for
+    Surfaces of either kind. Install it before the level loads, so its
+    fonts are created through the counting class.
+    """
+
+    def __init__(self):
+        self.frame = Counter()  # kind -> count this frame
+        self.sites = Counter()  # (kind, site) -> count while recording
+        self.recording = True
+        self._patched = []
+        self._profile_before = None
+
+    def record(self, kind, frame=None):
+        self.frame[kind] += 1
+        if self.recording:
+            self.sites[kind, call_site(frame or sys._getframe(2))] += 1
+
+    def _patch(self, owner, name, replacement):
+        self._patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, replacement)
+
+    def install(self):
+        import importlib
+
+        import pygame
+        counter = self
+        surface_type = pygame.Surface
+
+        class Surface(pygame.Surface):
+            def __init__(self, *args, **kwargs):
+                counter.record("Surface")
+                super().__init__(*args, **kwargs)
+
+        class Rect(pygame.Rect):
+            def __init__(self, *args, **kwargs):
+                counter.record("Rect")
+                super().__init__(*args, **kwargs)
+
+        class Font(pygame.font.Font):
+            def render(self, *args, **kwargs):
+                counter.record("Surface")
+                return super().render(*args, **kwargs)
+
+        self._patch(pygame, "Surface", Surface)
+        self._patch(pygame, "Rect", Rect)
+        self._patch(pygame.font, "Font", Font)
+        for module_name, names in SURFACE_FUNCTIONS.items():
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:  # surfarray needs NumPy
+                continue
+            for name in names:
+                if hasattr(module, name):
+                    self._patch(module, name, self._counting(getattr(module, name)))
+
+        def profile(frame, event, arg):
+            if event == "c_call" and arg.__name__ in SURFACE_METHODS and isinstance(arg.__self__, surface_type):
+                counter.record("Surface", frame)
+
+        self._profile_before = sys.getprofile()
+        sys.setprofile(profile)
+        return self
+
+    def _counting(self, function):
+        def counted(*args, **kwargs):
+            self.record("Surface")
+            return function(*args, **kwargs)
+        counted.__name__ = function.__name__
+        counted.__doc__ = function.__doc__
+        return counted
+
+    def uninstall(self):
+        sys.setprofile(self._profile_before)
+        self._profile_before = None
+        while self._patched:
+            owner, name, original = self._patched.pop()
+            setattr(owner, name, original)
+
+    def start_frame(self):
+        self.frame.clear()
+
+
+class AllocationProbe:
+    """Probe (see engine.probe) that measures each frame's allocations.
+
+    The first warmup frames (loading, caches filling up) are measured but
+    not reported.
+    """
+    enabled = True
+
+    def __init__(self, counter, warmup=300, budget_kb=DEFAULT_BUDGET_KB, surface_budget=0):
+        self.counter = counter
+        counter.recording = warmup == 0  # Loading happens before the first frame
+        self.warmup = warmup
+        self.budget = budget_kb * 1024
+        self.surface_budget = surface_budget
+        self.frames = []  # (frame, churn bytes, kept bytes, surfaces, rects) after the warm-up
+        self.kept_sites = Counter()  # site -> bytes kept over the reported frames
+        self.kept_blocks = Counter()
+        self.index = 0
+        self._start = 0
+        self._snapshot = None
+
+    def frame_start(self):
+        self.counter.recording = self.index >= self.warmup
+        self.counter.start_frame()
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def frame_end(self):
+        current, peak = tracemalloc.get_traced_memory()
+        counts = self.counter.frame
+        if self.index >= self.warmup:
+            self.frames.append((self.index, peak - self._start, current - self._start,
+                                counts["Surface"], counts["Rect"]))
+        if self.index == max(0, self.warmup - 1):
+            # Read after the frame's numbers: snapshots allocate too
+            self._snapshot = tracemalloc.take_snapshot()
+        self.index += 1
+
+    def finish(self):
+        """Attributes what the reported frames kept to game lines (one snapshot diff)."""
+        if self._snapshot is None:
+            return
+        own = (tracemalloc.__file__, __file__)
+        for stat in tracemalloc.take_snapshot().compare_to(self._snapshot, "traceback"):
+            if stat.size_diff > 0 and not any(frame.filename in own for frame in stat.traceback):
+                site = self._traceback_site(stat.traceback)
+                self.kept_sites[site] += stat.size_diff
+                self.kept_blocks[site] += max(0, stat.count_diff)
+        self._snapshot = None
+
+    @staticmethod
+    def _traceback_site(traceback):
+        fallback = None
+        for frame in reversed(traceback):  # Innermost first
+            if frame.filename.startswith(LEVELS_DIR) or frame.filename == MAIN_PATH:
+                return _site(frame.filename, frame.lineno, "")
+            if fallback is None and frame.filename.startswith(ENGINE_DIR):
+                fallback = _site(frame.filename, frame.lineno, "")
+        return fallback or _site(traceback[-1].filename, traceback[-1].lineno, "")
+
+    def over_budget(self):
+        return [f for f in self.frames if f[1] > self.budget or f[3] > self.surface_budget]
+
+    def report(self, top=15):
+        frames = self.frames
+        n = len(frames) or 1
+        over = self.over_budget()
+        sites = self.counter.sites
+        return {
+            "frames": len(frames),
+            "warmup": self.warmup,
+            "budget_kb": self.budget / 1024,
+            "surface_budget": self.surface_budget,
+            "churn_kb": {"mean": round(sum(f[1] for f in frames) / n / 1024, 2),
+                         "max": round(max((f[1] for f in frames), default=0) / 1024, 2)},
+            "kept_kb": round(sum(f[2] for f in frames) / 1024, 2),
+            "surfaces": sum(f[3] for f in frames),
+            "surfaces_per_frame": round(sum(f[3] for f in frames) / n, 3),
+            "rects_per_frame": round(sum(f[4] for f in frames) / n, 3),
+            "over_budget": len(over),
+            "worst_frames": [{"frame": f[0], "churn_kb": round(f[1] / 1024, 2), "surfaces": f[3], "rects": f[4]}
+                             for f in sorted(over, key=lambda f: (f[3], f[1]), reverse=True)[:top]],
+            "surface_sites": [{"site": site, "count": count}
+                              for (kind, site), count in sites.most_common() if kind == "Surface"][:top],
+            "rect_sites": [{"site": site, "count": count}
+                           for (kind, site), count in sites.most_common() if kind == "Rect"][:top],
+            "kept_sites": [{"site": site, "kb": round(size / 1024, 2), "blocks": self.kept_blocks[site]}
+                           for site, size in self.kept_sites.most_common(top)],
+        }
+
+
+def format_report(name, report):
+    lines = [
+        f"{name}: {report['frames']} frames after {report['warmup']} warm-up frames",
+        f"  churn per frame: {report['churn_kb']['mean']} KB mean, {report['churn_kb']['max']} KB max"
+        f" (budget {report['budget_kb']:g} KB)",
+        f"  kept overall:    {report['kept_kb']} KB",
+        f"  Surfaces:        {report['surfaces']} ({report['surfaces_per_frame']} per frame,"
+        f" budget {report['surface_budget']})",
+        f"  Rects:           {report['rects_per_frame']} per frame",
+        f"  frames over budget: {report['over_budget']}",
+    ]
+    for title, key, unit in (("Surface creations", "surface_sites", "count"),
+                             ("Rect creations", "rect_sites", "count"),
+                             ("Memory kept", "kept_sites", "kb")):
+        if report[key]:
+            lines.append(f"  {title}:")
+            lines += [f"    {entry[unit]:>10} {'KB' if unit == 'kb' else '  '}  {entry['site']}" for entry in report[key]]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-frame allocation report for a HELIOS level.")
+    parser.add_argument("--level", choices=("lvl1", "lvl3"), default="lvl1")
+    parser.add_argument("--frames", type=int, default=1200, help="Frames to run, warm-up included")
+    parser.add_argument("--warmup", type=int, default=300, help="Frames to leave out of the report")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget-kb", type=float, default=DEFAULT_BUDGET_KB, help="Churn allowed per frame")
+    parser.add_argument("--surface-budget", type=int, default=0, help="Surfaces allowed per frame")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser.add_argument("--out", help="Also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    from engine.bench import LEVELS, SCRIPTS, headless_env
+    os.environ.update(headless_env())
+    sys.path.insert(0, ROOT)
+    import importlib
+
+    from engine.input import ScriptedInput
+    from engine.loop import LockstepLoop
+    from engine.rng import streams
+
+    # Imported before tracing starts, so the snapshots only hold the game's memory
+    module = importlib.import_module(LEVELS[args.level])
+    counter = CreationCounter().install()
+    tracemalloc.start(TRACE_DEPTH)
+    try:
+        streams.reseed(args.seed)
+        probe = AllocationProbe(counter, args.warmup, args.budget_kb, args.surface_budget)
+        # The level's own prints would get in the way of the report
+        stdout, sys.stdout = sys.stdout, sys.stderr
+        try:
+            module.game_loop(input_source=ScriptedInput(SCRIPTS[args.level](args.seed)),
+                             max_frames=args.frames, probe=probe, sim=LockstepLoop(), fps=0)
+        finally:
+            sys.stdout = stdout
+        probe.finish()
+    finally:
+        tracemalloc.stop()
+        counter.uninstall()
+
+    report = probe.report(args.top)
+    print(format_report(args.level, report))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["over_budget"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Sprite-sheet animation with precomputed frames, masks and tints.
+
+A sheet is sliced once into Frames. Each Frame holds its surface, its
+collision mask and a tinted copy (the damage flash), plus mirrored versions
+when a clip is built flipped, so nothing is created while the game runs.
+A Clip is a list of frames played at a fixed rate; Animator picks the clip
+for the sprite's current state and returns the frame for the current tick
+by index arithmetic, which is O(1).
+
+    clips = build_clips(sheet, {"idle": [rect, ...], ...}, size=(52, 60))
+    animator = Animator(clips, "idle")
+    animator.play("thrust_left")
+    animator.tick()
+    sprite.image, sprite.mask = animator.image(damaged), animator.mask
+"""
+import pygame
+
+from engine.loop import TICK_RATE
+
+DAMAGE_TINT = (255, 0, 0)
+
+
+class Frame:
+    """One animation frame and everything derived from it."""
+    __slots__ = ("image", "mask", "tinted")
+
+    def __init__(self, image, tint=DAMAGE_TINT):
+        self.image = image
+        self.mask = pygame.mask.from_surface(image)
+        self.tinted = image.copy()
+        self.tinted.fill(tint, special_flags=pygame.BLEND_RGB_MULT)
+
+    def flipped(self, tint=DAMAGE_TINT):
+        return Frame(pygame.transform.flip(self.image, True, False), tint)
+
+
+class Clip:
+    """Frames played at fps simulation-time frames per second."""
+
+    def __init__(self, frames, fps=8, loop=True):
+        self.frames = frames
+        self.ticks_per_frame = max(1, TICK_RATE // fps)
+        self.loop = loop
+
+    def frame_at(self, ticks):
+        index = ticks // self.ticks_per_frame
+        count = len(self.frames)
+        return self.frames[index % count if self.loop else min(index, count - 1)]
+
+    def flipped(self):
+        return Clip([frame.flipped() for frame in self.frames], TICK_RATE // self.ticks_per_frame, self.loop)
+
+
+def remove_background(image, seeds=((0, 0),), color=(245, 245, 245), threshold=(24, 24, 24, 255)):
+    """Returns an alpha copy of an opaque image with its backdrop made transparent.
+
+    The backdrop is every pixel close to color that is connected to one of
+    the seed points, so light areas inside the outline of the sprite stay.
+    """
+    image = image.convert_alpha()
+    near = pygame.mask.from_threshold(image, color, threshold)
+    backdrop = pygame.mask.Mask(image.get_size())
+    for seed in seeds:
+        if near.get_at(seed):
+            backdrop.draw(near.connected_component(seed), (0, 0))
+    backdrop.to_surface(image, setcolor=(0, 0, 0, 0), unsetcolor=None)
+    return image
+
+
+def slice_frames(sheet, rects, size=None, backdrop=None):
+    """Cuts rects out of sheet, optionally removes a backdrop and scales to size."""
+    frames = []
+    for rect in rects:
+        image = sheet.subsurface(rect)
+        if backdrop is not None:
+            w, h = image.get_size()
+            image = remove_background(image, ((0, 0), (w - 1, 0), (0, h - 1), (w - 1, h - 1)), backdrop)
+        else:
+            image = image.convert_alpha()
+        if size:
+            image = pygame.transform.smoothscale(image, size)
+        frames.append(Frame(image))
+    return frames
+
+
+def build_clips(sheet, layout, size=None, backdrop=None, fps=8):
+    """Builds clips from {name: [rect, ...]}; a name ending in ':flip' mirrors another clip.
+
+        {"thrust_right": [...], "thrust_left": "thrust_right:flip"}
+    """
+    clips = {}
+    for name, rects in layout.items():
+        if not isinstance(rects, str):
+            clips[name] = Clip(slice_frames(sheet, rects, size, backdrop), fps)
+    for name, rects in layout.items():
+        if isinstance(rects, str):
+            source, _, mode = rects.partition(":")
+            clips[name] = clips[source].flipped() if mode == "flip" else clips[source]
+    return clips
+
+
+def static_clips(image, *names):
+    """One-frame clips for a sprite that has no sheet (or whose sheet failed to load)."""
+    clip = Clip([Frame(image)])
+    return {name: clip for name in names}
+
+
+class Animator:
+    """Tracks which clip a sprite plays and how far into it it is."""
+
+    def __init__(self, clips, state):
+        self.clips = clips
+        self.state = state
+        self.clip = clips[state]
+        self.ticks = 0
+        self.frame = self.clip.frame_at(0)
+
+    def play(self, state):
+        """Switches clip; the new clip starts from its first frame."""
+        if state != self.state:
+            self.state = state
+            self.clip = self.clips[state]
+            self.ticks = 0
+            self.frame = self.clip.frame_at(0)
+
+    def tick(self):
+        self.ticks += 1
+        self.frame = self.clip.frame_at(self.ticks)
+        return self.frame
+
+    def image(self, damaged=False):
+        return self.frame.tinted if damaged else self.frame.image
+
+    @property
+    def mask(self):
+        return self.frame.mask
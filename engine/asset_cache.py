@@ -0,0 +1,221 @@
+"""Baked image cache: pre-scaled pixels in one memory-mapped file.
+
+Decoding the PNG/JPG backgrounds and scaling them to screen size dominates
+startup. The bake step does that once, offline, and writes every image the
+scenes ask for (already at its target size, as 32-bit BGRA, which is the
+display's native byte order) into a single file:
+
+    magic (8 bytes) | header length (u32) | JSON header | pixel blobs
+
+The header maps each (path, size, alpha) entry to the offset of its pixels
+and the SHA-1 of the source file it was baked from. At runtime the file is
+memory-mapped and surfaces are built straight from it with
+pygame.image.frombuffer, with no decode and no scale. An entry whose source
+has changed (different size/mtime and different SHA-1) is ignored, and the
+normal loader decodes the original instead.
+
+    python -m engine.asset_cache            # bake every scene's images
+    python -m engine.asset_cache --out /tmp/assets.bin
+
+HELIOS_ASSET_CACHE overrides the cache path; set it to "off" to disable.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import pygame
+
+MAGIC = b"HELIOSAC"
+VERSION = 1
+ALIGN = 64
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, "asset_cache.bin")
+
+
+def cache_path():
+    return os.environ.get("HELIOS_ASSET_CACHE", DEFAULT_PATH)
+
+
+def _rel(path):
+    """Cache entries use paths relative to the repo, however the caller spelled them."""
+    return os.path.relpath(os.path.abspath(path), ROOT).replace(os.sep, "/")
+
+
+def _entry_name(path, size, alpha):
+    size_part = "x".join(map(str, size)) if size else "native"
+    return f"{_rel(path)}|{size_part}|{'alpha' if alpha else 'opaque'}"
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BakedAssets:
+    """Read side of the cache. Opens the file lazily on first lookup."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._mmap = None
+        self._entries = None
+        self._checked = {}
+        self.hits = 0
+        self.stale = 0
+
+    def _open(self):
+        if self._entries is not None:
+            return self._entries
+        self._entries = {}
+        path = self.path or cache_path()
+        if path == "off" or not os.path.exists(path):
+            return self._entries
+        try:
+            with open(path, "rb") as f:
+                # Copy-on-write so surfaces built on it are writable without touching the file
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            if self._mmap[:8] != MAGIC:
+                raise ValueError("bad magic")
+            version, header_len = struct.unpack_from("<II", self._mmap, 8)
+            if version != VERSION:
+                raise ValueError(f"version {version}")
+            self._entries = json.loads(self._mmap[16:16 + header_len])["entries"]
+        except (OSError, ValueError) as e:
+            print(f"Ignoring asset cache '{path}': {e}")
+            self._entries = {}
+        return self._entries
+
+    def _fresh(self, name, entry, path):
+        if name not in self._checked:
+            try:
+                stat = os.stat(path)
+                fresh = (stat.st_size == entry["source_size"] and stat.st_mtime_ns == entry["mtime_ns"]) \
+                    or file_sha1(path) == entry["sha1"]
+            except OSError:
+                fresh = False
+            if not fresh:
+                self.stale += 1
+            self._checked[name] = fresh
+        return self._checked[name]
+
+    def contains(self, path, size=None, alpha=True):
+        name = _entry_name(path, size, alpha)
+        entry = self._open().get(name)
+        return entry is not None and self._fresh(name, entry, path)
+
+    def load(self, path, size=None, alpha=True):
+        """Returns a surface built on the mapped pixels, or None if not baked or stale."""
+        name = _entry_name(path, size, alpha)
+        entry = self._open().get(name)
+        if entry is None or not self._fresh(name, entry, path):
+            return None
+        start = entry["offset"]
+        width, height = entry["size"]
+        view = memoryview(self._mmap)[start:start + width * height * 4]
+        surface = pygame.image.frombuffer(view, (width, height), "BGRA")
+        self.hits += 1
+        # Opaque images get the display's non-alpha format so blits skip blending
+        return surface if alpha else surface.convert()
+
+
+# Shared by the asset loaders
+baked = BakedAssets()
+
+
+class ManifestCollector:
+    """Stands in for a Preloader and records which images scenes would queue."""
+
+    def __init__(self):
+        self.images = []
+
+    def add_image(self, path, size=None, alpha=True, on_ready=None):
+        entry = (path, tuple(size) if size else None, alpha)
+        if entry not in self.images:
+            self.images.append(entry)
+
+    def add_sound(self, path, on_ready=None):
+        pass
+
+    def add_music(self, name, path, on_ready=None):
+        pass
+
+
+def bake(images, out_path):
+    """Decodes, scales and writes every (path, size, alpha) to out_path."""
+    entries = {}
+    blobs = []
+    offset = 0
+    for path, size, alpha in images:
+        try:
+            image = pygame.image.load(path)
+        except (pygame.error, OSError) as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        image = image.convert_alpha()
+        if size:
+            image = pygame.transform.scale(image, size)
+        pixels = pygame.image.tobytes(image, "BGRA")
+        stat = os.stat(path)
+        entries[_entry_name(path, size, alpha)] = {
+            "offset": offset,
+            "size": list(image.get_size()),
+            "sha1": file_sha1(path),
+            "source_size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        padding = -len(pixels) % ALIGN
+        blobs.append(pixels + b"\0" * padding)
+        offset += len(pixels) + padding
+
+    # Offsets so far are relative to the data section. Leave room in the
+    # header for them to grow when made absolute, then pad it out.
+    header = json.dumps({"entries": entries}).encode()
+    data_start = 16 + len(header) + 16 * len(entries)
+    data_start += -data_start % ALIGN
+    for entry in entries.values():
+        entry["offset"] += data_start
+    header = json.dumps({"entries": entries}).encode()
+    header += b" " * (data_start - 16 - len(header))
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<II", VERSION, len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, out_path)
+    return entries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bake scaled scene images into one cache file.")
+    parser.add_argument("--out", default=None, help="Cache file (default: HELIOS_ASSET_CACHE or asset_cache.bin)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    # A relative --out is relative to where the command was run, not to ROOT
+    out_path = os.path.abspath(args.out) if args.out else cache_path()
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    from main import create_scenes
+
+    collector = ManifestCollector()
+    for scene in create_scenes().values():
+        scene.preload(collector)
+    entries = bake(collector.images, out_path)
+    total = os.path.getsize(out_path)
+    print(f"Baked {len(entries)} images into {out_path} ({total / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Reference-counted asset registry shared by every scene.
+
+Scenes acquire their images (and later sounds) from the registry when they
+load and release them when they exit. An asset whose count drops to zero is
+not thrown away immediately but parked in a small idle pool, so switching
+back to a level (or restarting it) reuses the decoded surfaces instead of
+reading them from disk again. purge() drops everything idle, discard(key)
+one idle asset.
+"""
+from collections import OrderedDict
+
+import pygame
+
+from engine.asset_cache import baked
+
+
+class AssetRegistry:
+    """Maps asset keys to loaded objects with reference counts."""
+
+    def __init__(self, idle_limit=32):
+        self.idle_limit = idle_limit
+        self._assets = {}
+        self._refs = {}
+        self._idle = OrderedDict()
+        self.loads = 0
+        self.reuses = 0
+
+    def acquire(self, key, loader):
+        """Returns the asset for key, calling loader() only if it is not loaded.
+
+        Exceptions raised by loader propagate and nothing is stored.
+        """
+        if key in self._assets:
+            self._idle.pop(key, None)
+            self._refs[key] += 1
+            self.reuses += 1
+            return self._assets[key]
+
+        asset = loader()
+        self.loads += 1
+        self._assets[key] = asset
+        self._refs[key] = 1
+        return asset
+
+    def put(self, key, asset):
+        """Stores an already loaded asset (e.g. preloaded) in the idle pool."""
+        if key in self._assets:
+            return
+        self._assets[key] = asset
+        self._refs[key] = 0
+        self._idle[key] = True
+        while len(self._idle) > self.idle_limit:
+            old, _ = self._idle.popitem(last=False)
+            self._drop(old)
+
+    def release(self, key):
+        """Drops one reference; unused assets move to the idle pool."""
+        if key not in self._refs:
+            return
+        self._refs[key] -= 1
+        if self._refs[key] <= 0:
+            self._refs[key] = 0
+            self._idle[key] = True
+            while len(self._idle) > self.idle_limit:
+                old, _ = self._idle.popitem(last=False)
+                self._drop(old)
+
+    def discard(self, key):
+        """Unloads one asset right away if nobody holds a reference to it.
+
+        For assets that are only an intermediate step (a sprite sheet once
+        its frames are cut) and would otherwise sit in the idle pool.
+        """
+        if key in self._refs and self._refs[key] <= 0:
+            self._idle.pop(key, None)
+            self._drop(key)
+
+    def _drop(self, key):
+        self._assets.pop(key, None)
+        self._refs.pop(key, None)
+
+    def get(self, key):
+        return self._assets.get(key)
+
+    def refcount(self, key):
+        return self._refs.get(key, 0)
+
+    def purge(self):
+        """Unloads every asset nobody holds a reference to."""
+        for key in list(self._idle):
+            self._drop(key)
+        self._idle.clear()
+
+    def stats(self):
+        return {
+            "loaded": len(self._assets),
+            "idle": len(self._idle),
+            "loads": self.loads,
+            "reuses": self.reuses,
+        }
+
+
+# Shared by the whole process
+assets = AssetRegistry()
+
+
+def image_key(path, size=None, alpha=True):
+    return ("image", path, tuple(size) if size else None, alpha)
+
+
+def load_image(path, size=None, alpha=True):
+    """Loads, converts and optionally scales an image (the registry caches it).
+
+    Images baked into the asset cache come straight from it instead.
+    """
+    image = baked.load(path, size, alpha)
+    if image is not None:
+        return image
+    image = pygame.image.load(path)
+    image = image.convert_alpha() if alpha else image.convert()
+    if size:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def acquire_image(path, size=None, alpha=True, registry=None):
+    """Acquires an image through the registry; raises pygame.error if it fails."""
+    registry = registry or assets
+    return registry.acquire(image_key(path, size, alpha), lambda: load_image(path, size, alpha))
@@ -0,0 +1,153 @@
+"""Headless balance sweeps.
+
+Tuning lvl1's difficulty curve or lvl3's particle dodge by playing by hand
+is slow. Each level has a simulation core (lvl1.Lvl1Sim, lvl3.DodgeSim)
+that runs the level's rules without drawing, with a bot policy at the
+controls. This driver plays many seeded runs of it for every point of a
+parameter grid, fans them out over a process pool and prints one row of
+aggregated metrics per grid point.
+
+    python -m engine.balance lvl1 --runs 2000 --grid speed_step=0.4,0.8,1.2 --grid spawn_step=1,2,4
+    python -m engine.balance lvl3 --policy evade --grid spawn_interval=20,30,40 --out sweep.csv
+
+Grid keys are the level's rule names (lvl1.DIFFICULTY, lvl3.DODGE_RULES).
+Every grid point sees the same seeds, so rows differ only by the rules.
+"""
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# name: (module, simulation class, rules dict, default policy)
+LEVELS = {
+    "lvl1": ("levels.lvl1", "Lvl1Sim", "DIFFICULTY", "greedy"),
+    "lvl3": ("levels.lvl3.lvl3", "DodgeSim", "DODGE_RULES", "evade"),
+}
+PERCENTILES = (10, 50, 90)
+
+
+def load_level(name):
+    module_name, sim_name, rules_name, _ = LEVELS[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, sim_name), getattr(module, rules_name), module.SIM_POLICIES
+
+
+def run_batch(level, policy, rules, seeds, max_ticks):
+    """Plays one run per seed; runs in a worker process."""
+    sim_class, _, policies = load_level(level)
+    return [sim_class(seed, rules).run(policies[policy](), max_ticks) for seed in seeds]
+
+
+def parse_value(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(specs, defaults):
+    """["a=1,2", "b=3"] -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]"""
+    axes = []
+    for spec in specs:
+        key, _, values = spec.partition("=")
+        if key not in defaults:
+            raise ValueError(f"unknown rule {key!r}; choose from {', '.join(defaults)}")
+        axes.append([(key, parse_value(v)) for v in values.split(",") if v])
+    return [dict(point) for point in itertools.product(*axes)]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile, as in engine.bench."""
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(results):
+    """Means of every metric, plus survival percentiles."""
+    row = {"runs": len(results)}
+    for metric in results[0]:
+        row[metric] = round(sum(r[metric] for r in results) / len(results), 3)
+    survival = sorted(r["survival_s"] for r in results)
+    for pct in PERCENTILES:
+        row[f"survival_p{pct}"] = round(percentile(survival, pct), 2)
+    return row
+
+
+def sweep(level, policy, grid, runs, max_ticks, seed=0, workers=None, chunk=50):
+    """Runs every grid point over the same seeds; returns one summary row per point."""
+    seeds = list(range(seed, seed + runs))
+    batches = [seeds[i:i + chunk] for i in range(0, runs, chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(point, [pool.submit(run_batch, level, policy, point, batch, max_ticks) for batch in batches])
+                   for point in grid]
+        rows = []
+        for point, parts in futures:
+            results = [result for part in parts for result in part.result()]
+            rows.append({**point, **summarize(results)})
+    return rows
+
+
+def format_table(rows):
+    columns = list(rows[0])
+    cells = [[str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(r, widths)) for r in cells]
+    return "\n".join(lines)
+
+
+def write_rows(rows, path):
+    """Writes the table as JSON if path ends in .json, else CSV."""
+    with open(path, "w", newline="") as f:
+        if path.endswith(".json"):
+            json.dump(rows, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep level rules over many headless bot runs.")
+    parser.add_argument("level", choices=sorted(LEVELS))
+    parser.add_argument("--policy", help="Bot policy (default: the level's best bot)")
+    parser.add_argument("--grid", action="append", default=[], metavar="RULE=V1,V2,...")
+    parser.add_argument("--runs", type=int, default=1000, help="Seeded runs per grid point")
+    parser.add_argument("--minutes", type=float, default=5, help="Game time cap per run")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--out", help="Also write the table to this CSV / JSON file")
+    args = parser.parse_args(argv)
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    from engine.loop import TICK_RATE
+    _, defaults, policies = load_level(args.level)
+    policy = args.policy or LEVELS[args.level][3]
+    if policy not in policies:
+        parser.error(f"unknown policy {policy!r}; choose from {', '.join(policies)}")
+    try:
+        grid = parse_grid(args.grid, defaults)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    rows = sweep(args.level, policy, grid, args.runs, int(args.minutes * 60 * TICK_RATE), args.seed, args.workers)
+    print(format_table(rows))
+    print(f"{len(grid) * args.runs} runs of {args.level} ({policy}) in {time.perf_counter() - start:.1f} s",
+          file=sys.stderr)
+    if args.out:
+        write_rows(rows, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
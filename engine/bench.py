@@ -0,0 +1,177 @@
+"""Headless frame benchmark for the levels.
+
+Runs a level under the SDL dummy video/audio drivers with scripted input,
+a seeded RNG, uncapped rendering and one simulation tick per frame, then
+prints a JSON report with frame-time percentiles, time per phase and peak
+live-object counts.
+
+    python -m engine.bench --level lvl1 --frames 3000 --seed 1
+    python -m engine.bench --level all --out bench_output.json
+
+Importing a level does not touch the display: its game_loop() runs the
+level as a scene under a SceneManager (which opens the display and mixer)
+and calls pygame.quit() at the end. Each level still runs in its own
+subprocess, so it starts with cold process-wide caches (asset registry,
+scaled surfaces, text) instead of the ones the previous level warmed up.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+
+LEVELS = {
+    "lvl1": "levels.lvl1",
+    "lvl3": "levels.lvl3.lvl3",
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def lvl1_script(seed):
+    """Sweeps the sun left and right in random-length runs and restarts on game over."""
+    import pygame
+    from engine.input import key_down
+
+    rng = random.Random(seed)
+    plan = []
+
+    def script(frame):
+        while len(plan) <= frame:
+            key = rng.choice((pygame.K_LEFT, pygame.K_RIGHT, None))
+            plan.extend([key] * rng.randint(10, 60))
+        held = () if plan[frame] is None else (plan[frame],)
+        events = [key_down(pygame.K_SPACE)] if frame % 120 == 119 else []
+        return held, events
+
+    return script
+
+
+def lvl3_script(seed):
+    """Drifts the astronaut around, mashes SPACE for repairs and clicks Try Again."""
+    import pygame
+    from engine.input import key_down, mouse_click
+
+    rng = random.Random(seed)
+    directions = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+    plan = []
+    try_again = (400, 445)  # Center of the game-over button
+
+    def script(frame):
+        while len(plan) <= frame:
+            held = tuple(k for k in directions if rng.random() < 0.3)
+            plan.extend([held] * rng.randint(10, 40))
+        events = []
+        if frame % 3 == 0:
+            events.append(key_down(pygame.K_SPACE))
+        if frame % 180 == 179:
+            events.append(mouse_click(try_again))
+        return plan[frame], events, try_again
+
+    return script
+
+
+SCRIPTS = {"lvl1": lvl1_script, "lvl3": lvl3_script}
+
+
+def run_level(name, frames, seed):
+    """Runs one level in this process and returns its report as a dict."""
+    from engine.input import ScriptedInput
+    from engine.loop import LockstepLoop
+    from engine.probe import RecordingProbe
+    from engine.rng import streams
+
+    streams.reseed(seed)
+    module = importlib.import_module(LEVELS[name])
+    probe = RecordingProbe()
+    module.game_loop(
+        input_source=ScriptedInput(SCRIPTS[name](seed)),
+        max_frames=frames,
+        probe=probe,
+        sim=LockstepLoop(),
+        fps=0,
+    )
+    return build_report(name, frames, seed, probe)
+
+
+def build_report(name, frames, seed, probe):
+    times_ms = sorted(t * 1000.0 for t in probe.frame_times)
+    total_s = sum(probe.frame_times)
+    return {
+        "level": name,
+        "frames": len(times_ms),
+        "requested_frames": frames,
+        "seed": seed,
+        "total_s": round(total_s, 4),
+        "fps": round(len(times_ms) / total_s, 1) if total_s else 0.0,
+        "frame_ms": {
+            "p50": round(percentile(times_ms, 50), 3),
+            "p95": round(percentile(times_ms, 95), 3),
+            "p99": round(percentile(times_ms, 99), 3),
+            "max": round(times_ms[-1], 3) if times_ms else 0.0,
+            "mean": round(sum(times_ms) / len(times_ms), 3) if times_ms else 0.0,
+        },
+        "phase_ms": {phase: round(total * 1000.0, 3) for phase, total in probe.phase_totals.items()},
+        "peak_counts": probe.peak_counts,
+    }
+
+
+def headless_env():
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless frame benchmark for the HELIOS levels.")
+    parser.add_argument("--level", choices=sorted(LEVELS) + ["all"], default="all")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--inline", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Must be set before pygame is imported by the level
+    os.environ.update(headless_env())
+
+    if args.inline:
+        # Child process: the level's own prints go to stderr so stdout is only JSON
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        report = run_level(args.level, args.frames, args.seed)
+        stdout.write(json.dumps(report) + "\n")
+        return 0
+
+    names = sorted(LEVELS) if args.level == "all" else [args.level]
+    reports = []
+    for name in names:
+        cmd = [sys.executable, "-m", "engine.bench", "--inline", "--level", name,
+               "--frames", str(args.frames), "--seed", str(args.seed)]
+        result = subprocess.run(cmd, env=headless_env(), capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            return result.returncode
+        reports.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    output = json.dumps({"results": reports}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
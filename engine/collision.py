@@ -0,0 +1,170 @@
+"""Broadphase collision queries for sprite groups.
+
+SpatialGroup is a pygame sprite Group that also bins its sprites into a
+uniform grid, so a query only looks at sprites in the cells the target
+overlaps instead of the whole group. Candidates go through a bounding-circle
+test before the pixel mask test, and masks come from a cache shared by every
+sprite using the same surface (scaled surfaces are shared through
+engine.surface_cache, so one mask per source image and size bucket).
+Moving sprites call moved(sprite), which rebins just that sprite.
+"""
+import math
+import weakref
+
+import pygame
+
+
+class MaskCache:
+    """Shared pygame masks keyed on the surface they were built from.
+
+    Keyed on id(surface) like engine.surface_cache, so the cache does not
+    keep surfaces alive: once the scaled-surface cache has evicted a surface
+    and no sprite shows it any more, its mask goes too.
+    """
+
+    def __init__(self):
+        self._masks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, surface):
+        mask = self._masks.get(id(surface))
+        if mask is None:
+            self.misses += 1
+            mask = pygame.mask.from_surface(surface)
+            self._masks[id(surface)] = mask
+            # Runs when the surface is freed, before its id can be reused
+            weakref.finalize(surface, self._masks.pop, id(surface), None).atexit = False
+        else:
+            self.hits += 1
+        return mask
+
+    def clear(self):
+        self._masks.clear()
+
+    def __len__(self):
+        return len(self._masks)
+
+
+mask_cache = MaskCache()
+
+
+def bounding_radius(sprite):
+    """Radius of the circle enclosing sprite.rect, cached on the sprite."""
+    radius = getattr(sprite, "radius", None)
+    if radius is None:
+        radius = math.hypot(sprite.rect.width, sprite.rect.height) / 2
+        sprite.radius = radius
+    return radius
+
+
+def circles_overlap(a, b):
+    ra = bounding_radius(a)
+    rb = bounding_radius(b)
+    dx = a.rect.centerx - b.rect.centerx
+    dy = a.rect.centery - b.rect.centery
+    reach = ra + rb
+    return dx * dx + dy * dy <= reach * reach
+
+
+class SpatialGroup(pygame.sprite.Group):
+    """Sprite group with a uniform-grid index for collision queries.
+
+    Sprites are binned when added and unbinned when removed or killed.
+    A sprite that moves calls moved(self) (or group.rebin(sprite)), which
+    only touches the grid if its cell range changed.
+    """
+
+    def __init__(self, *sprites, cell_size=64):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._sprite_cells = {}
+        super().__init__(*sprites)
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def _bin(self, sprite, cell_range):
+        x0, y0, x1, y1 = cell_range
+        cells = self._cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    bucket = cells[(cx, cy)] = set()
+                bucket.add(sprite)
+        self._sprite_cells[sprite] = cell_range
+
+    def _unbin(self, sprite):
+        cell_range = self._sprite_cells.pop(sprite, None)
+        if cell_range is None:
+            return
+        x0, y0, x1, y1 = cell_range
+        cells = self._cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    bucket.discard(sprite)
+                    if not bucket:
+                        del cells[(cx, cy)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self._bin(sprite, self._cell_range(sprite.rect))
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self._unbin(sprite)
+
+    def rebin(self, sprite):
+        """Rebins sprite if it crossed into a different set of cells."""
+        cell_range = self._sprite_cells.get(sprite)
+        if cell_range is None:
+            return
+        new_range = self._cell_range(sprite.rect)
+        if new_range != cell_range:
+            self._unbin(sprite)
+            self._bin(sprite, new_range)
+
+    def query(self, rect):
+        """Sprites binned in any cell rect overlaps (a superset of the hits)."""
+        x0, y0, x1, y1 = self._cell_range(rect)
+        cells = self._cells
+        found = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    found |= bucket
+        return found
+
+    def collide(self, sprite, dokill=False, use_mask=False):
+        """Like pygame.sprite.spritecollide(sprite, self, dokill, ...) via the grid.
+
+        With use_mask the bounding circles are tested first and then the
+        pixel masks; otherwise the rects are compared.
+        """
+        hits = []
+        for other in self.query(sprite.rect):
+            if use_mask:
+                if not circles_overlap(sprite, other):
+                    continue
+                if not pygame.sprite.collide_mask(sprite, other):
+                    continue
+            elif not sprite.rect.colliderect(other.rect):
+                continue
+            hits.append(other)
+        if dokill:
+            for other in hits:
+                other.kill()
+        return hits
+
+
+def moved(sprite):
+    """Rebins sprite in every SpatialGroup it is in; call it after moving sprite.rect."""
+    for group in sprite.groups():
+        if isinstance(group, SpatialGroup):
+            group.rebin(sprite)
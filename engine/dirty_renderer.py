@@ -0,0 +1,88 @@
+"""Opt-in dirty-rectangle presentation for a LayeredDirty sprite group.
+
+With dirty rects enabled only the regions that changed this frame (moved
+sprites plus HUD elements registered with mark()) are repainted and sent to
+pygame.display.update(). Frames that cover the whole screen (flare, overlays,
+game over) call present_full(), which flips and forces the next dirty frame
+to repaint everything. Set HELIOS_DIRTY_RECTS=1 to turn it on.
+"""
+import os
+
+import pygame
+
+
+def dirty_rects_enabled():
+    """True when the HELIOS_DIRTY_RECTS environment variable is set to 1."""
+    return os.environ.get("HELIOS_DIRTY_RECTS", "0") == "1"
+
+
+class DirtyRenderer:
+    """Tracks changed regions of the screen and presents them."""
+
+    def __init__(self, screen, background, group, enabled=None):
+        self.screen = screen
+        self.group = group
+        self.enabled = dirty_rects_enabled() if enabled is None else enabled
+        self.screen_rect = screen.get_rect()
+        self._rects = []
+        self._marked = []
+        self._needs_full = True
+        self.set_background(background)
+
+    def set_background(self, background):
+        """Sets the surface used to erase sprites; None means solid black."""
+        if background is None:
+            background = pygame.Surface(self.screen_rect.size)
+            background.fill((0, 0, 0))
+        self.background = background
+        self.group.clear(self.screen, background)
+        self._needs_full = True
+
+    def invalidate(self):
+        """Forces the next frame to repaint the whole screen."""
+        self._needs_full = True
+
+    def begin(self):
+        """Queues last frame's marked regions (or the whole screen) for repaint."""
+        if self._needs_full or not self.enabled:
+            self.group.repaint_rect(self.screen_rect)
+            self._needs_full = False
+        else:
+            for rect in self._marked:
+                self.group.repaint_rect(rect)
+        self._marked = []
+        self._rects = []
+
+    def draw_sprites(self):
+        """Draws background and dirty sprites; returns the rects touched."""
+        rects = self.group.draw(self.screen)
+        self._rects.extend(rects)
+        return rects
+
+    def draw_all(self):
+        """Repaints the background and every sprite, for full-screen frames."""
+        self._marked = []
+        self._rects = []
+        self.group.repaint_rect(self.screen_rect)
+        return self.draw_sprites()
+
+    def mark(self, rect):
+        """Registers a region drawn outside the group (HUD text, icons)."""
+        if rect:
+            rect = pygame.Rect(rect)
+            self._rects.append(rect)
+            self._marked.append(rect)
+
+    def present(self):
+        """Updates only the changed regions, or flips when disabled."""
+        if self.enabled:
+            pygame.display.update(self._rects)
+        else:
+            pygame.display.flip()
+        self._rects = []
+
+    def present_full(self):
+        """Flips the whole screen; the next frame repaints from scratch."""
+        pygame.display.flip()
+        self._rects = []
+        self._needs_full = True
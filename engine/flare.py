@@ -0,0 +1,103 @@
+"""Baked solar flare effect.
+
+The original flare drew ten translucent circles per frame, each on its own
+full-screen SRCALPHA surface. Blending N layers of the same color is the same
+as blending once with the combined alpha, so the ring sequence is baked into
+a table of per-annulus alphas and drawn onto a single reused scratch surface.
+Playback reveals one more ring every ring_interval_ms and only blits the
+bounding box of the visible rings.
+"""
+import pygame
+
+
+class FlareEffect:
+    """Expanding concentric flare rings played back from a baked table."""
+
+    def __init__(self, screen_size, color=(255, 100, 0), ring_count=10,
+                 max_radius=None, ring_interval_ms=80):
+        self.screen_size = screen_size
+        self.color = color
+        self.ring_count = ring_count
+        self.max_radius = max_radius if max_radius is not None else int(screen_size[0] * 1.5)
+        self.ring_interval_ms = ring_interval_ms
+        self.center = (0, 0)
+        self.start_time = 0
+        self._radii = []
+        self._alpha_table = []
+        self._scratch = None
+        self._drawn = None
+        self._drawn_rect = None
+
+    def bake(self):
+        """Precomputes radii and combined alphas and allocates the scratch surface."""
+        n = self.ring_count
+        self._radii = [int(self.max_radius * (i / n)) for i in range(n)]
+        ring_alpha = [(255 - int(255 * (i / n))) / 255 for i in range(n)]
+
+        # _alpha_table[k][i]: alpha of the annulus just inside ring i when rings 0..k are visible
+        self._alpha_table = []
+        for k in range(n):
+            row = [0] * n
+            transparency = 1.0
+            for i in range(k, -1, -1):
+                transparency *= 1.0 - ring_alpha[i]
+                row[i] = int(round(255 * (1.0 - transparency)))
+            self._alpha_table.append(row)
+
+        if self._scratch is None or self._scratch.get_size() != tuple(self.screen_size):
+            self._scratch = pygame.Surface(self.screen_size, pygame.SRCALPHA)
+        self._scratch.fill((0, 0, 0, 0))
+        self._drawn = None
+        self._drawn_rect = None
+
+    def set_ring_count(self, ring_count):
+        """Changes how many rings are drawn; rebakes on the next draw."""
+        if ring_count != self.ring_count:
+            self.ring_count = max(1, ring_count)
+            self._radii = []
+
+    def start(self, center, now):
+        """Starts a new flare centered on center at time now (ms)."""
+        self.center = (int(center[0]), int(center[1]))
+        self.start_time = now
+
+    def visible_rings(self, now):
+        """Index of the outermost ring visible at time now."""
+        if self.ring_interval_ms <= 0:
+            return self.ring_count - 1
+        step = (now - self.start_time) // self.ring_interval_ms
+        return max(0, min(self.ring_count - 1, int(step)))
+
+    def _render(self, k):
+        if (self.center, k) == self._drawn:
+            return self._drawn_rect
+
+        if self._drawn_rect:
+            self._scratch.fill((0, 0, 0, 0), self._drawn_rect)
+
+        cx, cy = self.center
+        r, g, b = self.color[:3]
+        row = self._alpha_table[k]
+        # Largest first: each ring overwrites its interior with the combined alpha
+        for i in range(k, -1, -1):
+            radius = self._radii[i]
+            if radius < 1:
+                continue
+            pygame.draw.circle(self._scratch, (r, g, b, row[i]), self.center, radius)
+
+        outer = self._radii[k]
+        rect = pygame.Rect(cx - outer, cy - outer, outer * 2, outer * 2).clip(self._scratch.get_rect())
+        self._drawn = (self.center, k)
+        self._drawn_rect = rect
+        return rect
+
+    def draw(self, surface, now=None, k=None):
+        """Blits the current flare frame and returns the dirty rect it touched."""
+        if not self._radii:
+            self.bake()
+        if k is None:
+            k = self.ring_count - 1 if now is None else self.visible_rings(now)
+        rect = self._render(k)
+        if rect.width and rect.height:
+            surface.blit(self._scratch, rect, area=rect)
+        return rect
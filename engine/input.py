@@ -0,0 +1,92 @@
+"""Input sources for the level loops.
+
+The levels read input through an input source instead of calling
+pygame.event.get() / pygame.key.get_pressed() directly, so the same loop can
+be driven by the keyboard (LiveInput) or by a script (ScriptedInput) when
+running headless benchmarks. Only LiveInput can wait() for input; the scene
+manager uses that for idle screens, and scripted or recorded sessions keep
+rendering every frame so they stay deterministic.
+"""
+import pygame
+
+
+class KeyState:
+    """Indexable like pygame.key.get_pressed(), backed by a set of held keys."""
+    __slots__ = ("held",)
+
+    def __init__(self, held=()):
+        self.held = frozenset(held)
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+class LiveInput:
+    """Reads events, keys and mouse from pygame."""
+
+    def begin_frame(self):
+        pass
+
+    def events(self):
+        return pygame.event.get()
+
+    def wait(self, timeout_ms=0):
+        """Sleeps until an event arrives or timeout_ms passes (0: no timeout); returns the events."""
+        event = pygame.event.wait(timeout_ms)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        events.extend(pygame.event.get())
+        return events
+
+    def pressed(self):
+        return pygame.key.get_pressed()
+
+    def mouse_pos(self):
+        return pygame.mouse.get_pos()
+
+
+class ScriptedInput:
+    """Feeds input from script(frame) -> (held_keys, events[, mouse_pos]).
+
+    events is a list of pygame.event.Event. The real event queue is still
+    pumped so SDL stays responsive under the dummy video driver.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.frame = -1
+        self._held = KeyState()
+        self._events = []
+        self._mouse = (0, 0)
+
+    def begin_frame(self):
+        self.frame += 1
+        result = self.script(self.frame)
+        held, events = result[0], result[1]
+        if len(result) > 2:
+            self._mouse = result[2]
+        self._held = KeyState(held)
+        self._events = list(events)
+
+    def events(self):
+        pygame.event.pump()
+        events, self._events = self._events, []
+        return events
+
+    def pressed(self):
+        return self._held
+
+    def mouse_pos(self):
+        return self._mouse
+
+
+live_input = LiveInput()
+
+
+def key_down(key):
+    """Builds a KEYDOWN event for a scripted frame."""
+    return pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+
+
+def mouse_click(pos, button=1):
+    """Builds a MOUSEBUTTONDOWN event for a scripted frame."""
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button)
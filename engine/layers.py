@@ -0,0 +1,48 @@
+"""Pre-composited static layers.
+
+Sprites that never move (lvl3's satellite and repair panels) do not need to
+be drawn every frame on top of the background. StaticLayer draws the
+background and those sprites into one cached surface, which a DirtyRenderer
+then uses as its background: a frame costs one blit plus the moving
+sprites. When a static sprite changes its look, refresh(rect) recomposes
+just that region.
+"""
+import pygame
+
+
+class StaticLayer:
+    """A background with static sprites baked on top of it."""
+
+    def __init__(self, base, sprites=()):
+        self.base = base
+        self.sprites = list(sprites)
+        self.surface = base.copy()
+        self.rebuilds = 0
+        self.compose()
+
+    def compose(self):
+        """Redraws the whole layer."""
+        self.surface.blit(self.base, (0, 0))
+        for sprite in self.sprites:
+            self.surface.blit(sprite.image, sprite.rect)
+        self.rebuilds += 1
+        return self.surface
+
+    def refresh(self, rect):
+        """Recomposes only the region under rect; returns the clipped region."""
+        surface = self.surface
+        region = pygame.Rect(rect).clip(surface.get_rect())
+        surface.set_clip(region)
+        surface.blit(self.base, region, region)
+        for sprite in self.sprites:
+            if sprite.rect.colliderect(region):
+                surface.blit(sprite.image, sprite.rect)
+        surface.set_clip(None)
+        return region
+
+
+def dim_overlay(size, alpha=180, color=(0, 0, 0)):
+    """A translucent full-screen surface to darken what is behind a menu; build it once."""
+    overlay = pygame.Surface(size, pygame.SRCALPHA)
+    overlay.fill((*color, alpha))
+    return overlay
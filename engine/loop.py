@@ -0,0 +1,79 @@
+"""Fixed-timestep loop driver.
+
+Both levels count their timers in ticks (difficulty every 600 ticks, a
+particle every 30 ticks, friction per tick). FixedStepLoop turns the real
+time each rendered frame took into a whole number of fixed simulation ticks
+using an accumulator, so the game runs at the same speed whether rendering
+holds 60 FPS, drops frames, or is uncapped. alpha is the fraction of a tick
+left over, for interpolating positions when drawing. max_catch_up bounds
+the ticks run per frame so a long stall does not snowball, and time_scale
+lets the simulation run faster (or slower) than real time.
+"""
+import os
+
+TICK_RATE = 60
+
+
+def render_fps(default=60):
+    """Render frame cap from HELIOS_FPS; 0 means uncapped."""
+    return int(os.environ.get("HELIOS_FPS", default))
+
+
+class FixedStepLoop:
+    """Accumulator that converts frame time into fixed simulation ticks."""
+
+    def __init__(self, tick_rate=TICK_RATE, max_catch_up=5, time_scale=None):
+        self.tick_rate = tick_rate
+        self.step_ms = 1000.0 / tick_rate
+        self.max_catch_up = max_catch_up
+        if time_scale is None:
+            time_scale = float(os.environ.get("HELIOS_TIME_SCALE", "1"))
+        self.time_scale = time_scale
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.dropped_ms = 0.0
+        self.alpha = 0.0
+
+    def steps(self, frame_ms):
+        """Adds frame_ms of real time and returns how many ticks to run now."""
+        self.accumulator += frame_ms * self.time_scale
+        count = int(self.accumulator // self.step_ms)
+        limit = self.max_catch_up * max(1, int(self.time_scale))
+        if count > limit:
+            # Too far behind: run what we can and let the rest go
+            self.dropped_ms += (count - limit) * self.step_ms
+            count = limit
+            self.accumulator = self.accumulator % self.step_ms
+        else:
+            self.accumulator -= count * self.step_ms
+        self.ticks += count
+        self.alpha = self.accumulator / self.step_ms
+        return count
+
+    def skip(self, frame_ms):
+        """Lets frame_ms pass without running ticks, for an idle screen's timers."""
+        self.accumulator += frame_ms * self.time_scale
+        count = int(self.accumulator // self.step_ms)
+        self.accumulator -= count * self.step_ms
+        self.ticks += count
+        self.alpha = self.accumulator / self.step_ms
+        return count
+
+    def now_ms(self):
+        """Simulated time in milliseconds since the loop started."""
+        return int(self.ticks * self.step_ms)
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.dropped_ms = 0.0
+        self.alpha = 0.0
+
+
+class LockstepLoop(FixedStepLoop):
+    """Runs exactly one tick per rendered frame, for benchmarks and replays."""
+
+    def steps(self, frame_ms):
+        self.ticks += 1
+        self.alpha = 1.0
+        return 1
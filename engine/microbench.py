@@ -0,0 +1,309 @@
+"""Micro-benchmarks for the levels' hot functions, with a regression check.
+
+engine.bench times whole frames; this times the functions those frames
+spend their time in, one at a time, under the SDL dummy drivers:
+
+    lvl1: check_collision, Plasma.update / draw, Sun.get_scaled_image / draw,
+          solar_flare_animation, draw_text
+    lvl3: SolarParticle construction, Astronaut.update, the mask collision step
+
+Each benchmark body is one frame's worth of work (e.g. every plasma on a
+busy screen), timed like timeit: calibrated loop counts, several repeats,
+in a few fresh processes with a fixed hash seed, best time kept. Results are compared with the baseline in
+microbench_baseline.json and the run fails (exit status 1) when a body got
+slower than its baseline by more than the threshold.
+
+    python -m engine.microbench                     # compare with the baseline
+    python -m engine.microbench -k lvl3 --threshold 0.5
+    python -m engine.microbench --update-baseline   # after an intended change
+
+Timings depend on the machine: refresh the baseline on the machine that
+runs the check. Importing the levels must not open a window or start a
+game loop; the suite checks that before anything else.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "microbench_baseline.json")
+DEFAULT_THRESHOLD = 0.25  # Fail when 25% slower than the baseline
+SEED = 1
+HASH_SEED = "0"
+PLASMAS = 200  # A busy lvl1 screen
+PARTICLES = 60  # A busy lvl3 screen
+
+# name -> setup function returning the body to time
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def headless():
+    """Sets up pygame like the game would, without a visible window."""
+    for key, value in (("SDL_VIDEODRIVER", "dummy"), ("SDL_AUDIODRIVER", "dummy"),
+                       ("PYGAME_HIDE_SUPPORT_PROMPT", "1")):
+        os.environ.setdefault(key, value)
+    sys.path.insert(0, ROOT)
+    import pygame
+
+    import levels.lvl1
+    import levels.lvl3.lvl3
+    if pygame.display.get_surface() is not None:
+        raise RuntimeError("importing the levels opened a window")
+    pygame.init()
+    # Big enough for both levels; images are converted to its format
+    pygame.display.set_mode((800, 900))
+
+
+def _lvl1():
+    import pygame
+
+    from engine.rng import streams
+    from engine.scenes import Scene
+    from levels import lvl1
+
+    if lvl1.font_sm is None:
+        lvl1.load_assets(Scene())
+    streams.reseed(SEED)
+    screen = pygame.Surface((lvl1.SCREEN_WIDTH, lvl1.SCREEN_HEIGHT)).convert()
+    plasmas = [lvl1.Plasma(speed_increase=1.0) for _ in range(PLASMAS)]
+    return lvl1, screen, lvl1.Sun(), plasmas
+
+
+@benchmark("lvl1.check_collision")
+def bench_check_collision():
+    lvl1, _, sun, plasmas = _lvl1()
+    check = lvl1.check_collision
+
+    def body():
+        for plasma in plasmas:
+            check(sun, plasma)
+    return body
+
+
+@benchmark("lvl1.Plasma.update")
+def bench_plasma_update():
+    _, _, _, plasmas = _lvl1()
+
+    def body():
+        for plasma in plasmas:
+            plasma.update()
+            if plasma.y > 900:
+                plasma.y = -plasma.radius
+    return body
+
+
+@benchmark("lvl1.Plasma.draw")
+def bench_plasma_draw():
+    _, screen, _, plasmas = _lvl1()
+    for i, plasma in enumerate(plasmas):
+        plasma.y = (i * 37) % screen.get_height()
+
+    def body():
+        for plasma in plasmas:
+            plasma.draw(screen, 0.5)
+    return body
+
+
+@benchmark("lvl1.Sun.get_scaled_image")
+def bench_sun_scaled():
+    _, _, sun, _ = _lvl1()
+
+    def body():
+        # The sun grows one step per plasma eaten; the cache sees every size in turn
+        sun.charge = (sun.charge + 1) % 40
+        sun.get_scaled_image()
+    return body
+
+
+@benchmark("lvl1.Sun.draw")
+def bench_sun_draw():
+    _, screen, sun, _ = _lvl1()
+    sun.charge = 20
+
+    def body():
+        sun.draw(screen, 0.5)
+    return body
+
+
+@benchmark("lvl1.solar_flare_animation")
+def bench_flare():
+    lvl1, screen, sun, _ = _lvl1()
+    lvl1.flare_effect.start((sun.x, sun.y), 0)
+    duration = 2000
+
+    def body():
+        body.now = (body.now + 16) % duration
+        lvl1.solar_flare_animation(screen, sun, now=body.now)
+    body.now = 0
+    return body
+
+
+@benchmark("lvl1.draw_text")
+def bench_draw_text():
+    lvl1, screen, _, _ = _lvl1()
+    font, color = lvl1.font_sm, lvl1.TEXT_COLOR
+
+    def body():
+        # The HUD of one frame
+        lvl1.draw_counter(screen, "Time: ", 42, "s", font, color, 10, 50)
+        lvl1.draw_counter(screen, "Plasmas: ", 17, "", font, color, 10, 110)
+        lvl1.draw_text(screen, "Eat the plasmas to grow!", font, color, 350, 10, center=True)
+    return body
+
+
+def _lvl3():
+    from engine.rng import streams
+    from levels.lvl3 import lvl3
+
+    streams.reseed(SEED)
+    images = [lvl3.load_and_scale_sprite(os.path.join(lvl3.ASSET_DIR, f"particle{i}.png")) for i in (1, 2, 3)]
+    fallback = lvl3.load_and_scale_sprite(os.path.join(lvl3.ASSET_DIR, "astronaut.png"), (60, 60))
+    return lvl3, images, lvl3.Astronaut(lvl3.load_astronaut_clips(fallback))
+
+
+@benchmark("lvl3.SolarParticle")
+def bench_solar_particle():
+    lvl3, images, _ = _lvl3()
+
+    def body():
+        lvl3.SolarParticle(images)
+    return body
+
+
+@benchmark("lvl3.Astronaut.update")
+def bench_astronaut_update():
+    _, _, player = _lvl3()
+    player.thrust(1, 0)
+
+    def body():
+        player.update()
+    return body
+
+
+@benchmark("lvl3.mask_collision")
+def bench_mask_collision():
+    from engine.collision import SpatialGroup
+
+    lvl3, images, player = _lvl3()
+    particles = SpatialGroup(cell_size=64)
+    player.rect.center = (400, 300)
+    for i in range(PARTICLES):
+        particle = lvl3.SolarParticle(images)
+        # Half of them crowd the astronaut, so both the circle and mask tests run
+        particle.rect.center = (360 + (i * 13) % 80, 260 + (i * 7) % 80) if i % 2 else \
+            ((i * 97) % 800, (i * 53) % 600)
+        particles.add(particle)
+
+    def body():
+        particles.collide(player, use_mask=True)
+    return body
+
+
+def time_body(body, repeat):
+    """Best time per call of body, in microseconds."""
+    timer = timeit.Timer(body)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def run(names, repeat):
+    return {name: round(time_body(BENCHMARKS[name](), repeat), 3) for name in names}
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"results": {}}
+
+
+def compare(results, baseline, threshold):
+    """[(name, baseline_us, now_us, change)] for every body slower than threshold allows."""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before and now > before * (1.0 + threshold):
+            regressions.append((name, before, now, now / before - 1.0))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the HELIOS hot paths.")
+    parser.add_argument("-k", "--filter", default="*", help="Only benchmarks matching this glob")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repeats per process; the best one counts")
+    parser.add_argument("--processes", type=int, default=3,
+                        help="Fresh processes to time in (memory layout differs between them); the best one counts")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float,
+                        help=f"Allowed slowdown as a fraction (default: the baseline's, else {DEFAULT_THRESHOLD})")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--out", help="Also write the results as JSON to this file")
+    parser.add_argument("--inline", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    pattern = args.filter if any(c in args.filter for c in "*?[") else f"*{args.filter}*"
+    names = [name for name in BENCHMARKS if fnmatch.fnmatch(name, pattern)]
+    if not names:
+        parser.error(f"no benchmark matches {args.filter!r}")
+    if args.inline:
+        # Child process: the levels' own prints go to stderr so stdout is only JSON
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        headless()
+        stdout.write(json.dumps(run(names, args.repeat)) + "\n")
+        return 0
+
+    # Attribute lookups depend on the string hash seed: without a fixed one the
+    # same code lands up to ~1.8x apart from one process to the next
+    env = dict(os.environ, PYTHONHASHSEED=HASH_SEED)
+    cmd = [sys.executable, "-m", "engine.microbench", "--inline", "-k", args.filter, "--repeat", str(args.repeat)]
+    results = {}
+    for _ in range(args.processes):
+        result = subprocess.run(cmd, env=env, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            return result.returncode
+        for name, us in json.loads(result.stdout.strip().splitlines()[-1]).items():
+            results[name] = min(us, results.get(name, us))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = load_baseline(args.baseline)
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+    if args.update_baseline:
+        stored = {**baseline.get("results", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump({"threshold": threshold, "repeat": args.repeat, "results": stored}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    before = baseline.get("results", {})
+    regressions = compare(results, before, threshold)
+    slower = {name for name, *_ in regressions}
+    print(f"{'benchmark':32s} {'baseline us':>12s} {'now us':>12s} {'change':>8s}")
+    for name, now in results.items():
+        if name in before:
+            change = f"{now / before[name] - 1.0:+.0%}"
+            print(f"{name:32s} {before[name]:12.2f} {now:12.2f} {change:>8s}{'  REGRESSION' if name in slower else ''}")
+        else:
+            print(f"{name:32s} {'-':>12s} {now:12.2f} {'new':>8s}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) more than {threshold:.0%} slower than the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
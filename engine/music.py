@@ -0,0 +1,329 @@
+"""Streaming background music with crossfades.
+
+pygame.mixer.music plays one file at a time and can only fade out before
+the next one starts, and pygame.mixer.Sound decodes a whole file into
+memory (tens of MB for a three-minute track). MusicPlayer does neither:
+it splits each MP3 at frame boundaries into chunks of about half a second,
+decodes the next chunks on a background thread and queues them back to
+back on a mixer channel, so only a few chunks per track are ever in memory.
+
+Two tracks can play at once on two channels ("decks"), which is how
+play(name) crossfades: the new deck's volume ramps up while the old one
+ramps down, then the old deck stops. update() runs once per frame on the
+main thread and only queues already decoded chunks and sets volumes, so a
+track switch never blocks rendering.
+
+    music.add_track("calm", "musica/Calmada_1_zelda.mp3")
+    music.prime("calm")   # optional: decode the first chunk ahead of time
+    music.play("calm")
+    ...
+    music.update()   # every frame (the scene manager does this)
+"""
+import io
+import queue
+import threading
+from time import perf_counter
+
+import pygame
+
+from engine.sfx import DEFAULT_CHANNELS
+
+FEED_INTERVAL_MS = 250  # Well inside one queued chunk
+FADE_STEP_MS = 16
+
+# MPEG-1 and MPEG-2/2.5 Layer III bitrates (kbps) by header index
+_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+def _id3_size(data):
+    """Length of a leading ID3v2 tag, or 0."""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9]
+    return 10 + size + (10 if data[5] & 0x10 else 0)
+
+
+def _frame_length(header):
+    """Byte length of the Layer III frame with this 4-byte header, or 0 if invalid."""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 3
+    layer = (header[1] >> 1) & 3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    padding = (header[2] >> 1) & 1
+    bitrate = _BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    coefficient = 144 if version == 3 else 72
+    return coefficient * bitrate // sample_rate + padding
+
+
+def mp3_frames(f):
+    """Yields the raw bytes of each audio frame in an MP3 file object.
+
+    Skips the ID3v2 tag and the Xing/Info header frame, and resynchronizes
+    on junk between frames.
+    """
+    head = f.read(10)
+    f.seek(_id3_size(head))
+    first = True
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            return
+        length = _frame_length(header)
+        if length == 0:
+            # Not a frame header: slide forward one byte and try again
+            f.seek(-3, io.SEEK_CUR)
+            continue
+        body = f.read(length - 4)
+        if len(body) < length - 4:
+            return
+        frame = header + body
+        if first:
+            first = False
+            if b"Xing" in frame[:64] or b"Info" in frame[:64]:
+                continue
+        yield frame
+
+
+class TrackStream:
+    """Background thread that decodes one track into a small queue of chunks.
+
+    Each chunk is decoded together with the last frame of the previous one,
+    and that frame's samples are trimmed again, so the MP3 bit reservoir
+    does not leave a click at chunk boundaries.
+    """
+
+    SAMPLES_PER_FRAME = 1152
+
+    def __init__(self, path, chunk_frames=24, ahead=3, loop=True):
+        self.path = path
+        # 24 frames of 1152 samples ~ 0.6 s at 44.1 kHz. pygame holds the GIL
+        # while decoding, so small chunks keep each main-thread stall short.
+        self.chunk_frames = chunk_frames
+        self.loop = loop
+        self.chunks = queue.Queue(maxsize=ahead)
+        self.error = None
+        self.ready = threading.Event()  # Set once the first chunk is decoded (or the thread ends)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"music:{path}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            mixer_rate, mixer_size, mixer_channels = pygame.mixer.get_init()
+            trim = self.SAMPLES_PER_FRAME * mixer_channels * (abs(mixer_size) // 8)
+            while not self._stop.is_set():
+                with open(self.path, "rb") as f:
+                    previous = None
+                    frames = []
+                    for frame in mp3_frames(f):
+                        frames.append(frame)
+                        if len(frames) == self.chunk_frames:
+                            self._emit(previous, frames, trim)
+                            previous, frames = frames[-1], []
+                        if self._stop.is_set():
+                            return
+                    if frames:
+                        self._emit(previous, frames, trim)
+                if not self.loop:
+                    break
+        except (pygame.error, OSError) as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def _emit(self, previous, frames, trim):
+        data = b"".join(frames if previous is None else [previous] + frames)
+        sound = pygame.mixer.Sound(file=io.BytesIO(data))
+        if previous is not None:
+            raw = sound.get_raw()
+            if len(raw) > trim:
+                sound = pygame.mixer.Sound(buffer=raw[trim:])
+        self._put(sound)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                self.ready.set()
+                return
+            except queue.Full:
+                pass
+
+    def next_chunk(self):
+        """Returns a decoded chunk if one is ready, without blocking."""
+        try:
+            return self.chunks.get_nowait()
+        except queue.Empty:
+            return None
+
+    @property
+    def finished(self):
+        """True once the thread is done and every chunk has been taken."""
+        return not self._thread.is_alive() and self.chunks.empty()
+
+    def stop(self, wait=False):
+        self._stop.set()
+        if wait:
+            self._thread.join()
+
+
+class Deck:
+    """One mixer channel fed by one TrackStream."""
+
+    def __init__(self, channel, name, stream):
+        self.channel = channel
+        self.name = name
+        self.stream = stream
+        self.volume = 0.0
+        self.target = 0.0
+        self.ended = False
+
+    def feed(self):
+        """Keeps one chunk playing and one queued behind it."""
+        if self.ended:
+            return
+        if not self.channel.get_busy():
+            chunk = self.stream.next_chunk()
+            if chunk is not None:
+                self.channel.play(chunk)
+            elif self.stream.finished:
+                self.ended = True
+            return
+        if self.channel.get_queue() is None:
+            chunk = self.stream.next_chunk()
+            if chunk is not None:
+                self.channel.queue(chunk)
+
+    def stop(self, wait=False):
+        self.stream.stop(wait)
+        self.channel.stop()
+
+
+class MusicPlayer:
+    """Plays named tracks on two decks and crossfades between them."""
+
+    def __init__(self, first_channel=DEFAULT_CHANNELS, fade_ms=2000, volume=0.6):
+        self.first_channel = first_channel
+        self.fade_ms = fade_ms
+        self.volume = volume
+        self.tracks = {}
+        self.current = None
+        self._decks = []
+        self._primed = {}
+        self._free = None
+        self._last = None
+
+    @property
+    def enabled(self):
+        return pygame.mixer.get_init() is not None
+
+    def add_track(self, name, path):
+        self.tracks[name] = path
+
+    def prime(self, name):
+        """Starts decoding a track ahead of play(), which then begins on a ready chunk.
+
+        Returns the TrackStream, or None if there is nothing to prime.
+        """
+        if name == self.current or name not in self.tracks or not self.enabled:
+            return None
+        stream = self._primed.get(name)
+        if stream is None:
+            stream = self._primed[name] = TrackStream(self.tracks[name])
+        return stream
+
+    def _channels(self):
+        if self._free is None:
+            needed = self.first_channel + 2
+            if pygame.mixer.get_num_channels() < needed:
+                pygame.mixer.set_num_channels(needed)
+            self._free = [pygame.mixer.Channel(self.first_channel + i) for i in range(2)]
+        return self._free
+
+    def play(self, name, fade_ms=None):
+        """Crossfades to the named track; does nothing if it is already playing."""
+        if name == self.current or name not in self.tracks or not self.enabled:
+            return
+        self.current = name
+        channels = self._channels()
+        # At most two decks: a third switch mid-fade cuts the oldest one
+        while len(self._decks) >= 2:
+            old = self._decks.pop(0)
+            old.stop()
+            channels.append(old.channel)
+        for deck in self._decks:
+            deck.target = 0.0
+        if not self._decks:
+            self._last = None
+        stream = self._primed.pop(name, None) or TrackStream(self.tracks[name])
+        deck = Deck(channels.pop(0), name, stream)
+        deck.channel.set_volume(0.0)
+        deck.target = 1.0
+        self._decks.append(deck)
+        if fade_ms is not None:
+            self.fade_ms = fade_ms
+
+    def stop(self, wait=False):
+        for deck in self._decks:
+            deck.stop(wait)
+            self._free.append(deck.channel)
+        self._decks = []
+        for stream in self._primed.values():
+            stream.stop(wait)
+        self._primed = {}
+        self.current = None
+        self._last = None
+
+    def update(self):
+        """Feeds the decks and steps the crossfade. Never blocks."""
+        if not self._decks:
+            return
+        now = perf_counter()
+        dt = 0.0 if self._last is None else now - self._last
+        self._last = now
+        step = dt * 1000.0 / self.fade_ms if self.fade_ms else 1.0
+        for deck in list(self._decks):
+            if deck.stream.error is not None:
+                print(f"Music stream error for '{deck.stream.path}': {deck.stream.error}")
+                deck.stream.error = None
+            deck.feed()
+            if deck.volume < deck.target:
+                deck.volume = min(deck.target, deck.volume + step)
+            elif deck.volume > deck.target:
+                deck.volume = max(deck.target, deck.volume - step)
+            deck.channel.set_volume(deck.volume * self.volume)
+            if (deck.target == 0.0 and deck.volume == 0.0) or deck.ended:
+                deck.stop()
+                self._decks.remove(deck)
+                self._free.append(deck.channel)
+                if deck.name == self.current and deck.ended:
+                    self.current = None
+
+    def wake_ms(self):
+        """How long the main thread may go without calling update(), or None if it does not matter.
+
+        A chunk is about half a second and one is queued behind the playing
+        one; a crossfade wants a volume step every frame.
+        """
+        if not self._decks:
+            return None
+        if any(deck.volume != deck.target for deck in self._decks):
+            return FADE_STEP_MS
+        return FEED_INTERVAL_MS
+
+
+# Shared by every scene
+music = MusicPlayer()
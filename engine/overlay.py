@@ -0,0 +1,95 @@
+"""In-game profiler overlay.
+
+Press F3 in any scene to show FPS, a frame-time graph and the average time
+spent in each phase over the last half second. The overlay reads a
+RingProbe; when the game starts with the NullProbe, the first F3 swaps in
+a RingProbe, so profiling costs nothing until somebody asks for it.
+
+HELIOS_PROFILE=1 starts with the overlay shown, and the recorded frames are
+written on exit to HELIOS_PROFILE_OUT (CSV, or JSON for a .json name;
+default profile.csv).
+"""
+import os
+
+import pygame
+
+from engine.probe import IDLE_PHASES
+from engine.text_cache import get_font, text_cache
+
+PROFILER_KEY = pygame.K_F3
+PANEL_SIZE = (240, 168)
+GRAPH_HEIGHT = 50
+GRAPH_MAX_MS = 50.0  # Frame time at the top of the graph
+BUDGET_MS = 1000.0 / 60
+AVERAGE_FRAMES = 30
+
+PHASE_COLORS = {
+    "events": (200, 200, 200),
+    "update": (100, 200, 255),
+    "collide": (255, 180, 80),
+    "draw": (120, 230, 120),
+    "flip": (230, 120, 230),
+}
+
+
+def profiling_enabled():
+    return os.environ.get("HELIOS_PROFILE", "0") == "1"
+
+
+def profile_path():
+    return os.environ.get("HELIOS_PROFILE_OUT", "profile.csv")
+
+
+class ProfilerOverlay:
+    """Draws a RingProbe's recent frames in a corner of the screen."""
+
+    def __init__(self, probe, visible=True):
+        self.probe = probe
+        self.visible = visible
+        self.font = get_font(None, 20)
+        self.panel = pygame.Surface(PANEL_SIZE, pygame.SRCALPHA)
+        self.rect = self.panel.get_rect()
+
+    def draw(self, screen):
+        """Draws the panel at the top-right corner and returns its rect."""
+        probe = self.probe
+        panel = self.panel
+        font = self.font
+        width, height = PANEL_SIZE
+        panel.fill((0, 0, 0, 190))
+
+        frame_ms, phases = probe.averages(AVERAGE_FRAMES)
+        # The breakdown shows where the work goes; time slept to the cap is not work
+        phases = {phase: ms for phase, ms in phases.items() if phase not in IDLE_PHASES}
+        fps = int(round(1000.0 / frame_ms)) if frame_ms else 0
+        text_cache.blit_number(panel, font, "FPS ", fps, "", (255, 255, 255), (6, 4))
+        text_cache.blit_number(panel, font, "", f"{frame_ms:.2f}", " ms", (255, 255, 255), (90, 4))
+
+        # Frame-time graph, newest on the right, with the 60 FPS budget line
+        top = 22
+        scale = GRAPH_HEIGHT / GRAPH_MAX_MS
+        budget_y = top + GRAPH_HEIGHT - int(BUDGET_MS * scale)
+        pygame.draw.line(panel, (90, 90, 90), (4, budget_y), (width - 5, budget_y))
+        for x, ms in enumerate(probe.recent_frame_ms(width - 8), start=4):
+            bar = min(GRAPH_HEIGHT, int(ms * scale))
+            color = (120, 230, 120) if ms <= BUDGET_MS else (255, 90, 90)
+            pygame.draw.line(panel, color, (x, top + GRAPH_HEIGHT), (x, top + GRAPH_HEIGHT - bar))
+
+        # Per-phase breakdown: a stacked bar and one line per phase
+        y = top + GRAPH_HEIGHT + 6
+        total = sum(phases.values()) or 1.0
+        x = 4
+        for phase, ms in phases.items():
+            w = int((width - 8) * ms / total)
+            pygame.draw.rect(panel, PHASE_COLORS.get(phase, (255, 255, 255)), (x, y, w, 6))
+            x += w
+        y += 10
+        for phase, ms in phases.items():
+            color = PHASE_COLORS.get(phase, (255, 255, 255))
+            text_cache.blit(panel, font, phase, color, (6, y))
+            text_cache.blit_number(panel, font, "", f"{ms:.2f}", " ms", color, (90, y))
+            y += 15
+
+        self.rect = panel.get_rect(topright=(screen.get_width() - 4, 4))
+        screen.blit(panel, self.rect)
+        return self.rect
@@ -0,0 +1,76 @@
+"""Frame pacing and idle mode.
+
+Gameplay needs a steady frame rate, but how to get it is a trade-off:
+
+- "tick" (default): Clock.tick sleeps until the next frame. Cheapest on
+  power, with a millisecond or two of jitter from the OS scheduler.
+- "busy": Clock.tick_busy_loop spins for the last stretch instead of
+  sleeping. Precise, but keeps a core at 100%.
+- "vsync": the display waits for the monitor's refresh on flip, and the
+  clock only measures (with a loose cap in case the driver ignores the
+  request). Smoothest; falls back to "tick" if vsync cannot be set up.
+
+Static screens (the intro once everything is loaded, game-over screens)
+do not need frames at all. A scene says so through Scene.idle_timeout();
+the scene manager then blocks in pygame.event.wait until input arrives or
+the scene's next timer is due, and only redraws when something changed.
+The kiosks are fanless and throttle under constant load, so an idle
+screen should cost next to nothing.
+
+HELIOS_PACING=tick|busy|vsync picks the mode; HELIOS_IDLE=0 turns idle
+mode off (every screen renders at the frame cap, as before).
+"""
+import os
+
+import pygame
+
+PACING_MODES = ("tick", "busy", "vsync")
+VSYNC_CAP_RATIO = 2
+
+
+def pacing_mode():
+    """The frame pacing mode from HELIOS_PACING."""
+    mode = os.environ.get("HELIOS_PACING", "tick").strip().lower()
+    return mode if mode in PACING_MODES else "tick"
+
+
+def idle_enabled():
+    return os.environ.get("HELIOS_IDLE", "1") != "0"
+
+
+class FramePacer:
+    """Owns the clock's waiting: per-frame pacing and idle sleeps."""
+
+    def __init__(self, clock, mode=None):
+        self.clock = clock
+        self.mode = pacing_mode() if mode is None else mode
+        self.vsync = False  # True once a vsync display is actually open
+
+    def set_mode(self, size):
+        """Opens the display, with vsync when asked for and available."""
+        if self.mode == "vsync":
+            try:
+                screen = pygame.display.set_mode(size, pygame.SCALED, vsync=1)
+                self.vsync = True
+                return screen
+            except pygame.error as e:
+                print(f"Vsync not available ({e}), pacing with the clock")
+                self.mode = "tick"
+        self.vsync = False
+        return pygame.display.set_mode(size)
+
+    def tick(self, fps):
+        """Waits for the next frame; returns the ms since the last one."""
+        if self.vsync:
+            # flip() already waited for the refresh. The loose cap only matters if
+            # the driver quietly ignored the vsync request, so that never spins.
+            return self.clock.tick(fps * VSYNC_CAP_RATIO)
+        if self.mode == "busy":
+            return self.clock.tick_busy_loop(fps)
+        return self.clock.tick(fps)
+
+    @staticmethod
+    def idle_timeout(*timeouts):
+        """Combines wake-up deadlines (None: no deadline) into one event.wait timeout (0: forever)."""
+        due = [t for t in timeouts if t]
+        return max(1, int(min(due))) if due else 0
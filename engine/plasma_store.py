@@ -0,0 +1,162 @@
+"""Struct-of-arrays plasma storage backed by NumPy.
+
+lvl1 keeps one Plasma object per falling plasma and updates, collides and
+removes them one at a time. PlasmaStore keeps x, y, speed and radius in
+contiguous arrays instead, so movement, off-screen culling and the
+squared-distance test against the sun are single vectorized passes and
+removal is a swap-remove compaction. PlasmaView exposes the Plasma
+attributes for a single slot when per-plasma access is needed.
+
+NumPy is optional: HAS_NUMPY is False when it is not installed and callers
+should keep using the list of Plasma objects.
+"""
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+
+class PlasmaView:
+    """Read-only Plasma-like view of one slot in a PlasmaStore."""
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def x(self):
+        return float(self.store.x[self.index])
+
+    @property
+    def y(self):
+        return float(self.store.y[self.index])
+
+    @property
+    def speed(self):
+        return float(self.store.speed[self.index])
+
+    @property
+    def radius(self):
+        return int(self.store.radius[self.index])
+
+    def interpolated_y(self, alpha=1.0):
+        """y between the previous tick and the current one, for drawing."""
+        return self.y - self.speed * (1.0 - alpha)
+
+    def draw(self, surface, alpha=1.0):
+        image = self.store.image_for_radius(self.radius) if self.store.image_for_radius else None
+        self.store.draw_one(surface, self.x, self.interpolated_y(alpha), self.radius, image)
+
+
+class PlasmaStore:
+    """Growable struct-of-arrays container for falling plasmas."""
+
+    def __init__(self, capacity=256, image_for_radius=None, draw_fallback=None):
+        if not HAS_NUMPY:
+            raise RuntimeError("PlasmaStore requires NumPy")
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.float64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.radius = np.zeros(capacity, dtype=np.int32)
+        # image_for_radius(radius) -> Surface or None; draw_fallback(surface, x, y, radius)
+        self.image_for_radius = image_for_radius
+        self.draw_fallback = draw_fallback
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield PlasmaView(self, i)
+
+    def _grow(self, needed):
+        capacity = len(self.x)
+        while capacity < needed:
+            capacity *= 2
+        for name in ("x", "y", "speed", "radius"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, x, y, speed, radius):
+        """Appends one plasma and returns its slot index."""
+        if self.count >= len(self.x):
+            self._grow(self.count + 1)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.speed[i] = speed
+        self.radius[i] = radius
+        self.count += 1
+        return i
+
+    def clear(self):
+        self.count = 0
+
+    def update(self, steps=1.0):
+        """Moves every plasma down by its speed."""
+        n = self.count
+        self.y[:n] += self.speed[:n] * steps
+
+    def collide_circle(self, cx, cy, r):
+        """Indices of plasmas whose circle overlaps the circle (cx, cy, r)."""
+        n = self.count
+        dx = self.x[:n] - cx
+        dy = self.y[:n] - cy
+        reach = self.radius[:n] + r
+        return np.flatnonzero(dx * dx + dy * dy < reach * reach)
+
+    def offscreen(self, max_y):
+        """Indices of plasmas that have fallen past max_y plus their radius."""
+        n = self.count
+        return np.flatnonzero(self.y[:n] > max_y + self.radius[:n])
+
+    def remove(self, indices):
+        """Swap-removes the given slots; slot order is not preserved."""
+        if len(indices) == 0:
+            return
+        n = self.count
+        dead = np.unique(np.asarray(indices, dtype=np.intp))
+        new_n = n - len(dead)
+        # Holes below new_n are filled from the survivors in the tail
+        holes = dead[dead < new_n]
+        tail_alive = np.ones(n - new_n, dtype=bool)
+        tail_alive[dead[dead >= new_n] - new_n] = False
+        sources = np.flatnonzero(tail_alive) + new_n
+        for arr in (self.x, self.y, self.speed, self.radius):
+            arr[holes] = arr[sources]
+        self.count = new_n
+
+    def draw(self, surface, alpha=1.0):
+        """Draws every plasma, batching image blits into one Surface.blits call.
+
+        alpha interpolates between the previous tick and the current one.
+        """
+        n = self.count
+        if n == 0:
+            return
+        xs = self.x[:n].astype(np.int32)
+        ys = (self.y[:n] - self.speed[:n] * (1.0 - alpha)).astype(np.int32)
+        radii = self.radius[:n]
+        batch = []
+        for x, y, radius in zip(xs.tolist(), ys.tolist(), radii.tolist()):
+            image = self.image_for_radius(radius) if self.image_for_radius else None
+            if image is None:
+                self.draw_one(surface, x, y, radius, None)
+            else:
+                w, h = image.get_size()
+                batch.append((image, (x - w // 2, y - h // 2)))
+        if batch:
+            surface.blits(batch, doreturn=False)
+
+    def draw_one(self, surface, x, y, radius, image):
+        if image is not None:
+            w, h = image.get_size()
+            surface.blit(image, (int(x) - w // 2, int(y) - h // 2))
+        elif self.draw_fallback:
+            self.draw_fallback(surface, int(x), int(y), radius)
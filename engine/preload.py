@@ -0,0 +1,132 @@
+"""Background asset preloader.
+
+While the intro screen is up, a small thread pool decodes the images and
+sounds the levels will need (pygame releases the GIL while decoding and
+scaling), and music tracks are primed: their stream starts and decodes its
+first chunk, so play() starts on a ready chunk. Surfaces still have to be
+converted to the display format on the main thread, so each frame the intro
+calls pump(), which finishes a few completed jobs within a time budget and
+hands them to the asset registry's idle pool. When a level later acquires the same key it is reused instantly.
+
+    preloader = Preloader()
+    preloader.add_image("levels/lvl3/background.png", (800, 600))
+    ...
+    preloader.pump()      # every frame; progress goes 0.0 -> 1.0
+    preloader.finish()    # block until everything is ready
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import pygame
+
+from engine.asset_cache import baked
+from engine.assets import assets, image_key
+from engine.music import music
+from engine.sfx import load_sound, sound_key
+
+
+def _decode_image(path, size):
+    image = pygame.image.load(path)
+    if size:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def _prime_track(stream):
+    stream.ready.wait()
+    if stream.error is not None:
+        raise stream.error
+    return stream
+
+
+class Preloader:
+    """Decodes assets on worker threads and registers them on the main thread."""
+
+    def __init__(self, registry=None, workers=4):
+        self.registry = registry or assets
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preload")
+        self._jobs = deque()
+        self._keys = set()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+
+    def _submit(self, key, decode, finish, on_ready, *args, store=True):
+        if key in self._keys or self.registry.get(key) is not None:
+            return
+        self._keys.add(key)
+        self._jobs.append((key, self._executor.submit(decode, *args), finish, on_ready, store))
+        self.total += 1
+
+    def add_image(self, path, size=None, alpha=True, on_ready=None):
+        """Queues an image under the same key Scene.acquire_image() uses."""
+        if baked.contains(path, size, alpha):
+            # Already decoded and scaled on disk; loading it is just a mapping
+            return
+        finish = (lambda image: image.convert_alpha()) if alpha else (lambda image: image.convert())
+        self._submit(image_key(path, size, alpha), _decode_image, finish, on_ready, path, tuple(size) if size else None)
+
+    def add_sound(self, path, on_ready=None):
+        """Queues a pygame.mixer.Sound (fully decoded PCM, via the WAV cache if enabled)."""
+        if not pygame.mixer.get_init():
+            return
+        self._submit(sound_key(path), load_sound, None, on_ready, path)
+
+    def add_music(self, name, path, on_ready=None):
+        """Primes a music track: its stream starts decoding and the job waits for the first chunk.
+
+        Only a few chunks are ever held, never the whole file; music.play(name)
+        picks the stream up.
+        """
+        music.add_track(name, path)
+        stream = music.prime(name)
+        if stream is not None:
+            self._submit(("music", name), _prime_track, None, on_ready, stream, store=False)
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def finished(self):
+        return not self._jobs
+
+    def pump(self, budget_ms=4.0):
+        """Finishes completed jobs on the main thread, in order, within budget_ms."""
+        deadline = perf_counter() + budget_ms / 1000.0
+        while self._jobs and self._jobs[0][1].done():
+            self._complete(self._jobs.popleft())
+            if perf_counter() >= deadline:
+                break
+        return self.progress
+
+    def finish(self):
+        """Blocks until every queued asset is decoded and registered."""
+        while self._jobs:
+            self._complete(self._jobs.popleft())
+        self._executor.shutdown(wait=True)
+
+    def _complete(self, job):
+        key, future, finish, on_ready, store = job
+        try:
+            asset = future.result()
+            if finish is not None:
+                asset = finish(asset)
+        except (pygame.error, OSError) as e:
+            # The scene that needs it will try again (and report it) when it loads
+            print(f"Preload failed for {key[1]}: {e}")
+            self.failed += 1
+        else:
+            if store:
+                self.registry.put(key, asset)
+            if on_ready is not None:
+                on_ready(asset)
+        self.done += 1
+
+    def cancel(self):
+        """Drops whatever has not finished yet."""
+        for _, future, _, _, _ in self._jobs:
+            future.cancel()
+        self._jobs.clear()
+        self._executor.shutdown(wait=False)
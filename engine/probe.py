@@ -0,0 +1,148 @@
+"""Per-frame phase timing hooks for the level loops.
+
+A level calls probe.frame_start() once per frame, probe.lap(phase) after
+each phase (the time since the previous lap is added to that phase),
+probe.count(name, value) for live-object counts and probe.frame_end().
+The "sleep" phase is the frame pacer's wait, so the others add up to the
+work done in a frame.
+The default NullProbe does nothing, so the hooks cost one method call each
+when nobody is measuring. RecordingProbe keeps everything (benchmarks) and
+RingProbe keeps a fixed window of recent frames (the profiler overlay).
+"""
+import csv
+import json
+from array import array
+from time import perf_counter
+
+PHASES = ("events", "sleep", "update", "collide", "draw", "flip")
+IDLE_PHASES = ("sleep",)  # Waiting for the frame cap, not work
+
+
+class NullProbe:
+    """Probe that ignores every call."""
+    enabled = False
+
+    def frame_start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def frame_end(self):
+        pass
+
+
+null_probe = NullProbe()
+
+
+class RecordingProbe:
+    """Keeps every frame's total time, phase times and object counts."""
+    enabled = True
+
+    def __init__(self):
+        self.frame_times = []
+        self.phase_totals = dict.fromkeys(PHASES, 0.0)
+        self.peak_counts = {}
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def frame_start(self):
+        self._frame_start = self._last = perf_counter()
+
+    def lap(self, phase):
+        now = perf_counter()
+        self.phase_totals[phase] = self.phase_totals.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def count(self, name, value):
+        if value > self.peak_counts.get(name, 0):
+            self.peak_counts[name] = value
+
+    def frame_end(self):
+        self.frame_times.append(perf_counter() - self._frame_start)
+
+
+class RingProbe:
+    """Keeps the last capacity frames in preallocated ring buffers.
+
+    Used by the in-game profiler overlay: memory stays fixed however long
+    the game runs, and export() writes the buffer out as CSV or JSON.
+    """
+    enabled = True
+
+    def __init__(self, capacity=600, phases=PHASES):
+        self.capacity = capacity
+        self.phases = tuple(phases)
+        self.frame_ms = array("d", bytes(8 * capacity))
+        self.phase_ms = {phase: array("d", bytes(8 * capacity)) for phase in self.phases}
+        self.counts = {}
+        self.index = 0  # Slot the next frame goes into
+        self.size = 0
+        self.frames = 0
+        self._current = dict.fromkeys(self.phases, 0.0)
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def frame_start(self):
+        self._frame_start = self._last = perf_counter()
+
+    def lap(self, phase):
+        now = perf_counter()
+        self._current[phase] = self._current.get(phase, 0.0) + (now - self._last)
+        self._last = now
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def frame_end(self):
+        i = self.index
+        self.frame_ms[i] = (perf_counter() - self._frame_start) * 1000.0
+        current = self._current
+        for phase in self.phases:
+            self.phase_ms[phase][i] = current[phase] * 1000.0
+            current[phase] = 0.0
+        self.index = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.frames += 1
+
+    def _order(self, last=None):
+        """Buffer slots from oldest to newest (only the last n if given)."""
+        n = self.size if last is None else min(last, self.size)
+        start = (self.index - n) % self.capacity
+        return [(start + k) % self.capacity for k in range(n)]
+
+    def recent_frame_ms(self, last=None):
+        return [self.frame_ms[i] for i in self._order(last)]
+
+    def averages(self, last=None):
+        """Mean frame time and per-phase times (ms) over the last frames."""
+        order = self._order(last)
+        if not order:
+            return 0.0, dict.fromkeys(self.phases, 0.0)
+        n = len(order)
+        frame = sum(self.frame_ms[i] for i in order) / n
+        return frame, {phase: sum(self.phase_ms[phase][i] for i in order) / n for phase in self.phases}
+
+    def rows(self):
+        """One dict per buffered frame, oldest first."""
+        first = self.frames - self.size
+        return [
+            dict(frame=first + k, frame_ms=round(self.frame_ms[i], 4),
+                 **{phase: round(self.phase_ms[phase][i], 4) for phase in self.phases})
+            for k, i in enumerate(self._order())
+        ]
+
+    def export(self, path):
+        """Writes the buffer to path, as JSON if it ends in .json, else CSV."""
+        rows = self.rows()
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump({"phases": list(self.phases), "counts": self.counts, "frames": rows}, f, indent=1)
+            else:
+                writer = csv.DictWriter(f, fieldnames=["frame", "frame_ms", *self.phases])
+                writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
@@ -0,0 +1,97 @@
+"""Adaptive quality governor.
+
+The render loop only caps the frame rate: when a frame overruns its budget
+(a large sun rescale, the flare, hundreds of plasmas) the game just slows
+down. QualityGovernor watches how long each frame's work took (without the
+time the clock spent sleeping) and steps down one quality tier when the
+rolling mean goes over budget. It steps back up only after the mean has
+stayed well under budget for a few seconds, so it does not flap between
+two tiers. Scenes map the tier to their own knobs in Scene.set_quality().
+
+HELIOS_QUALITY=auto (default) lets the governor decide; a tier name or
+index (high, medium, low, minimal / 0-3) pins the tier.
+"""
+import os
+from collections import deque
+
+TIERS = ("high", "medium", "low", "minimal")
+DEFAULT_BUDGET_MS = 1000.0 / 60
+
+
+def quality_setting():
+    """(auto, tier) from HELIOS_QUALITY."""
+    value = os.environ.get("HELIOS_QUALITY", "auto").strip().lower()
+    if value in TIERS:
+        return False, TIERS.index(value)
+    if value.isdigit():
+        return False, min(int(value), len(TIERS) - 1)
+    return True, 0
+
+
+class QualityGovernor:
+    """Picks a quality tier (0 = best) from rolling frame times."""
+
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS, window=30, degrade_ratio=1.0,
+                 recover_ratio=0.6, recover_frames=180, tier=0, auto=True):
+        self.budget_ms = budget_ms
+        self.window = window
+        self.degrade_ratio = degrade_ratio  # Step down above this fraction of the budget
+        self.recover_ratio = recover_ratio  # Step up after recover_frames below this one
+        self.recover_frames = recover_frames
+        self.auto = auto
+        self.tier = 0
+        self.changes = 0
+        self._samples = deque(maxlen=window)
+        self._total = 0.0
+        self._calm = 0
+        self.set_tier(tier)
+        self.changes = 0
+
+    @property
+    def name(self):
+        return TIERS[self.tier]
+
+    @property
+    def mean_ms(self):
+        return self._total / len(self._samples) if self._samples else 0.0
+
+    def set_tier(self, tier):
+        """Switches to tier and starts a fresh measurement window."""
+        tier = max(0, min(len(TIERS) - 1, tier))
+        if tier != self.tier:
+            self.tier = tier
+            self.changes += 1
+        self.reset()
+
+    def reset(self):
+        """Forgets the samples, e.g. after a scene switch's loading frame."""
+        self._samples.clear()
+        self._total = 0.0
+        self._calm = 0
+
+    def observe(self, work_ms):
+        """Adds one frame's work time; returns True when the tier changed."""
+        if not self.auto:
+            return False
+        samples = self._samples
+        if len(samples) == self.window:
+            self._total -= samples[0]
+        samples.append(work_ms)
+        self._total += work_ms
+        if len(samples) < self.window:
+            return False
+
+        mean = self._total / self.window
+        if mean > self.budget_ms * self.degrade_ratio:
+            if self.tier < len(TIERS) - 1:
+                self.set_tier(self.tier + 1)
+                return True
+            return False
+        if mean < self.budget_ms * self.recover_ratio and self.tier > 0:
+            self._calm += 1
+            if self._calm >= self.recover_frames:
+                self.set_tier(self.tier - 1)
+                return True
+        else:
+            self._calm = 0
+        return False
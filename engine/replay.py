@@ -0,0 +1,433 @@
+"""Record and replay play sessions, tick for tick.
+
+A recording holds the master RNG seed and, for every rendered frame, the
+number of simulation ticks that ran, the interpolation alpha, the keys the
+game found held, the KEYDOWN / MOUSEBUTTONDOWN events, the mouse position,
+the quality tier (it can change the simulation, e.g. lvl1's spawn cap) and
+a checksum of the scene state. The header also keeps the environment
+settings that change the simulation (SIM_ENV: storm mode, the plasma
+store, space-weather data, time scale), and playback applies them.
+Replaying feeds exactly that back in, so the simulation (and every frame
+drawn) is identical to the original, and the checksums prove it.
+
+File layout (little endian):
+
+    header: b"HRPL" | version u16 | tick rate u16 | seed i64 | start scene (u8 len + utf-8)
+            | settings (u16 len + JSON {name: value})    (version 3)
+    frame:  ticks u8 | flags u8 | alpha u16
+            [held keys changed]  count u8 + keys i32...
+            [events]             count u8 + (KEYDOWN: 1 u8, key i32 | click: 2 u8, x i16, y i16, button u8)...
+            [mouse moved]        x i16, y i16
+            [checksum]           crc32 u32
+            [quality changed]    tier u8      (version 2)
+
+    python main.py --record session.hrpl
+    python -m engine.replay session.hrpl                # headless, prints a frame report
+    python -m engine.replay session.hrpl --out report.json
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = b"HRPL"
+VERSION = 3
+ALPHA_SCALE = 65535
+
+# Environment variables that change the simulation, not just how it is shown
+SIM_ENV = ("HELIOS_STORM", "HELIOS_PLASMA_STORE", "HELIOS_SPACE_WEATHER", "HELIOS_SPACE_WEATHER_START",
+           "HELIOS_SPACE_WEATHER_SPEEDUP", "HELIOS_TIME_SCALE")
+
+HELD, EVENTS, MOUSE, CHECKSUM, QUALITY = 1, 2, 4, 8, 16
+KEYDOWN, CLICK = 1, 2
+
+_FRAME = struct.Struct("<BBH")
+_KEY = struct.Struct("<i")
+_CLICK = struct.Struct("<hhB")
+_MOUSE = struct.Struct("<hh")
+_CRC = struct.Struct("<I")
+
+
+def sim_env():
+    """The SIM_ENV settings in effect, with the archive directory made absolute."""
+    env = {name: os.environ[name] for name in SIM_ENV if os.environ.get(name)}
+    if "HELIOS_SPACE_WEATHER" in env:
+        archives = os.path.abspath(env.pop("HELIOS_SPACE_WEATHER"))
+        if os.path.isdir(archives):  # Otherwise the game runs without them
+            env["HELIOS_SPACE_WEATHER"] = archives
+    return env
+
+
+def apply_env(env):
+    """Sets the recorded SIM_ENV settings before the levels are imported.
+
+    Raises RuntimeError when that cannot reproduce the recording: a level
+    already read other settings at import, or the recorded space-weather
+    archives are not here.
+    """
+    changed = [name for name in SIM_ENV if os.environ.get(name) != env.get(name)]
+    if changed and "levels.lvl1" in sys.modules:
+        raise RuntimeError(f"the recording needs {', '.join(changed)} as recorded; replay it in a fresh process")
+    archives = env.get("HELIOS_SPACE_WEATHER")
+    if archives and not os.path.isdir(archives):
+        raise RuntimeError(f"the recording used the space-weather archives in {archives}, which are not here")
+    for name in SIM_ENV:
+        if name in env:
+            os.environ[name] = env[name]
+        else:
+            os.environ.pop(name, None)
+
+
+def state_checksum(scene):
+    digest = scene.state_digest()
+    return None if digest is None else zlib.crc32(repr(digest).encode())
+
+
+class WatchedKeys:
+    """Wraps a pressed-keys object and remembers which queried keys were held."""
+    __slots__ = ("pressed", "held")
+
+    def __init__(self, pressed, held):
+        self.pressed = pressed
+        self.held = held
+
+    def __getitem__(self, key):
+        value = self.pressed[key]
+        if value:
+            self.held.add(key)
+        return value
+
+
+class Recorder:
+    """Writes a session while the game runs; wraps the real input and loop."""
+
+    def __init__(self, path, seed, start, tick_rate):
+        import pygame
+        self._pygame = pygame
+        self.file = open(path, "wb")
+        name = start.encode()
+        settings = json.dumps(sim_env(), sort_keys=True).encode()
+        self.file.write(MAGIC + struct.pack("<HHqB", VERSION, tick_rate, seed, len(name)) + name
+                        + struct.pack("<H", len(settings)) + settings)
+        self.frames = 0
+        self._held = set()
+        self._last_held = set()
+        self._events = []
+        self._mouse = None
+        self._last_mouse = None
+        self._tier = None
+        self._ticks = 0
+        self._alpha = 0
+
+    def wrap_input(self, source):
+        return RecordingInput(source, self)
+
+    def wrap_sim(self, sim):
+        return RecordingLoop(sim, self)
+
+    def end_frame(self, scene):
+        """Appends this frame's record. Called by the scene manager after presenting."""
+        flags = 0
+        extra = []
+        if self._held != self._last_held:
+            flags |= HELD
+            extra.append(struct.pack("<B", len(self._held)) + b"".join(_KEY.pack(k) for k in sorted(self._held)))
+            self._last_held = set(self._held)
+        if self._events:
+            flags |= EVENTS
+            extra.append(struct.pack("<B", len(self._events)) + b"".join(self._events))
+        if self._mouse is not None and self._mouse != self._last_mouse:
+            flags |= MOUSE
+            extra.append(_MOUSE.pack(*self._mouse))
+            self._last_mouse = self._mouse
+        checksum = state_checksum(scene)
+        if checksum is not None:
+            flags |= CHECKSUM
+            extra.append(_CRC.pack(checksum))
+        # The tier this frame ran with (the governor may change it afterwards)
+        tier = scene.app.quality.tier
+        if tier != self._tier:
+            flags |= QUALITY
+            extra.append(struct.pack("<B", tier))
+            self._tier = tier
+        self.file.write(_FRAME.pack(min(self._ticks, 255), flags, self._alpha) + b"".join(extra))
+        self.frames += 1
+        self._held = set()
+        self._events = []
+        self._mouse = None
+
+    def record_event(self, event):
+        pygame = self._pygame
+        if event.type == pygame.KEYDOWN:
+            self._events.append(struct.pack("<B", KEYDOWN) + _KEY.pack(event.key))
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self._events.append(struct.pack("<B", CLICK) + _CLICK.pack(*event.pos, event.button))
+
+    def close(self):
+        self.file.close()
+
+
+class RecordingInput:
+    """Passes the wrapped input source through while recording it."""
+
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+
+    def begin_frame(self):
+        self.source.begin_frame()
+
+    def events(self):
+        events = self.source.events()
+        for event in events:
+            self.recorder.record_event(event)
+        return events
+
+    def pressed(self):
+        return WatchedKeys(self.source.pressed(), self.recorder._held)
+
+    def mouse_pos(self):
+        pos = self.source.mouse_pos()
+        self.recorder._mouse = pos
+        return pos
+
+
+class RecordingLoop:
+    """Wraps the real loop; stores its tick count and a quantized alpha."""
+
+    def __init__(self, sim, recorder):
+        self.sim = sim
+        self.recorder = recorder
+        self.alpha = 0.0
+
+    def steps(self, frame_ms):
+        count = min(self.sim.steps(frame_ms), 255)
+        quantized = int(round(self.sim.alpha * ALPHA_SCALE))
+        # Draw with exactly the alpha the replay will see
+        self.alpha = quantized / ALPHA_SCALE
+        self.recorder._ticks = count
+        self.recorder._alpha = quantized
+        return count
+
+    def now_ms(self):
+        return self.sim.now_ms()
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+
+class Replay:
+    """Reads a recording and acts as input source, loop and frame checker."""
+
+    def __init__(self, path):
+        import pygame
+        from engine.input import KeyState, key_down, mouse_click
+        from engine.loop import FixedStepLoop
+
+        self._pygame = pygame
+        self._key_state = KeyState
+        self._key_down = key_down
+        self._mouse_click = mouse_click
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a replay file")
+        version, self.tick_rate, self.seed, name_len = struct.unpack_from("<HHqB", data, 4)
+        if version not in (1, 2, VERSION):
+            raise ValueError(f"unsupported replay version {version}")
+        offset = 4 + struct.calcsize("<HHqB")
+        self.start = data[offset:offset + name_len].decode()
+        offset += name_len
+        self.env = None  # Not stored before version 3: whatever the environment says
+        if version >= 3:
+            (settings_len,) = struct.unpack_from("<H", data, offset)
+            self.env = json.loads(data[offset + 2:offset + 2 + settings_len])
+            offset += 2 + settings_len
+        self._data = data
+        self._offset = offset
+        self.frames = self._count_frames()
+        self.frame = -1
+        self.mismatch = None
+        self.quality = None  # The manager's QualityGovernor, pinned to the recorded tiers
+        time_scale = None if self.env is None else float(self.env.get("HELIOS_TIME_SCALE", "1"))
+        self.sim = ReplayLoop(self, FixedStepLoop(self.tick_rate, time_scale=time_scale))
+        self._held = KeyState()
+        self._events = []
+        self._mouse = (0, 0)
+        self._ticks = 0
+        self._alpha = 0.0
+        self._checksum = None
+
+    def _read(self, offset):
+        """Decodes the frame at offset; returns (fields, next offset)."""
+        data = self._data
+        ticks, flags, alpha = _FRAME.unpack_from(data, offset)
+        offset += _FRAME.size
+        held = events = mouse = checksum = tier = None
+        if flags & HELD:
+            count = data[offset]
+            held = [_KEY.unpack_from(data, offset + 1 + 4 * i)[0] for i in range(count)]
+            offset += 1 + 4 * count
+        if flags & EVENTS:
+            count = data[offset]
+            offset += 1
+            events = []
+            for _ in range(count):
+                kind = data[offset]
+                if kind == KEYDOWN:
+                    events.append((KEYDOWN, _KEY.unpack_from(data, offset + 1)))
+                    offset += 1 + _KEY.size
+                else:
+                    events.append((CLICK, _CLICK.unpack_from(data, offset + 1)))
+                    offset += 1 + _CLICK.size
+        if flags & MOUSE:
+            mouse = _MOUSE.unpack_from(data, offset)
+            offset += _MOUSE.size
+        if flags & CHECKSUM:
+            checksum = _CRC.unpack_from(data, offset)[0]
+            offset += _CRC.size
+        if flags & QUALITY:
+            tier = data[offset]
+            offset += 1
+        return (ticks, alpha, held, events, mouse, checksum, tier), offset
+
+    def _count_frames(self):
+        count, offset = 0, self._offset
+        while offset < len(self._data):
+            _, offset = self._read(offset)
+            count += 1
+        return count
+
+    # Input source interface
+    def begin_frame(self):
+        self.frame += 1
+        if self._offset >= len(self._data):
+            self._ticks, self._events = 0, []
+            return
+        (ticks, alpha, held, events, mouse, checksum, tier), self._offset = self._read(self._offset)
+        self._ticks = ticks
+        self._alpha = alpha / ALPHA_SCALE
+        if held is not None:
+            self._held = self._key_state(held)
+        self._events = []
+        for kind, values in events or ():
+            if kind == KEYDOWN:
+                self._events.append(self._key_down(values[0]))
+            else:
+                self._events.append(self._mouse_click(values[:2], values[2]))
+        if mouse is not None:
+            self._mouse = mouse
+        if tier is not None and self.quality is not None:
+            self.quality.set_tier(tier)
+        self._checksum = checksum
+
+    def events(self):
+        self._pygame.event.pump()
+        events, self._events = self._events, []
+        return events
+
+    def pressed(self):
+        return self._held
+
+    def mouse_pos(self):
+        return self._mouse
+
+    def end_frame(self, scene):
+        """Compares the scene state with the recorded checksum."""
+        if self._checksum is not None and self.mismatch is None:
+            if state_checksum(scene) != self._checksum:
+                self.mismatch = self.frame
+
+    def close(self):
+        pass
+
+
+class ReplayLoop:
+    """Runs the recorded number of ticks per frame with the recorded alpha."""
+
+    def __init__(self, replay, sim):
+        self.replay = replay
+        self.sim = sim
+        self.alpha = 0.0
+
+    def steps(self, frame_ms):
+        count = self.replay._ticks
+        self.sim.ticks += count
+        self.alpha = self.replay._alpha
+        return count
+
+    def now_ms(self):
+        return self.sim.now_ms()
+
+    def __getattr__(self, name):
+        return getattr(self.sim, name)
+
+
+def replay(path, probe=None):
+    """Replays path headlessly and uncapped; returns (Replay, probe)."""
+    from engine.bench import headless_env
+    os.environ.update(headless_env())
+
+    session = Replay(path)
+    if session.env is not None:
+        # lvl1 reads its modes when imported, so this goes first
+        apply_env(session.env)
+
+    from engine.probe import RecordingProbe
+    from engine.rng import streams
+    from engine.scenes import SceneManager
+    from main import create_scenes
+
+    streams.reseed(session.seed)
+    probe = probe or RecordingProbe()
+    manager = SceneManager(input_source=session, probe=probe, sim=session.sim, fps=0, recorder=session)
+    manager.quality.auto = False
+    session.quality = manager.quality
+    for name, scene in create_scenes().items():
+        manager.add(name, scene)
+    manager.run(session.start, max_frames=session.frames)
+    return session, probe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session headlessly.")
+    parser.add_argument("path")
+    parser.add_argument("--out", help="Write the frame report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Paths on the command line are relative to where the command was run
+    args.path = os.path.abspath(args.path)
+    if args.out:
+        args.out = os.path.abspath(args.out)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, root)
+    os.chdir(root)
+    from engine.bench import build_report
+
+    stdout = sys.stdout
+    sys.stdout = sys.stderr  # The game's own prints stay out of the report
+    try:
+        session, probe = replay(args.path)
+    except RuntimeError as e:
+        print(f"Cannot replay {args.path}: {e}")
+        return 2
+    finally:
+        sys.stdout = stdout
+
+    report = build_report(os.path.basename(args.path), session.frames, session.seed, probe)
+    report["identical"] = session.mismatch is None
+    report["first_mismatch"] = session.mismatch
+    report["settings"] = session.env
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0 if session.mismatch is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
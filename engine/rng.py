@@ -0,0 +1,46 @@
+"""Named, seedable random-number streams.
+
+Each kind of random decision in the game draws from its own stream
+(plasma spawns, particle spawns, ...), all derived from one master seed.
+Seeding the master seed makes a whole session reproducible, and because
+the streams are independent, adding a random call in one system does not
+shift the numbers every other system sees.
+
+    _plasma_rng = stream("lvl1.plasma")    # module level, once
+    _plasma_rng.randint(20, 35)
+    streams.reseed(1234)                   # replays and benchmarks
+"""
+import random
+
+
+class RandomStreams:
+    """Hands out random.Random instances keyed by name."""
+
+    def __init__(self, seed=None):
+        self._streams = {}
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Sets the master seed (a fresh one if None) and reseeds every stream in place."""
+        self.seed = random.SystemRandom().randrange(1 << 63) if seed is None else seed
+        for name, rng in self._streams.items():
+            rng.seed(self._stream_seed(name))
+        return self.seed
+
+    def _stream_seed(self, name):
+        # String seeds are hashed with SHA-512 by random, so this is stable across runs
+        return f"{self.seed}:{name}"
+
+    def stream(self, name):
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = self._streams[name] = random.Random(self._stream_seed(name))
+        return rng
+
+
+# Shared by the whole process
+streams = RandomStreams()
+
+
+def stream(name):
+    return streams.stream(name)
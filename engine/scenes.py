@@ -0,0 +1,299 @@
+"""Scene manager with one persistent display and mixer.
+
+Each screen of the game (intro, lvl1, lvl3) is a Scene with load / enter /
+update / draw / exit hooks. SceneManager initializes pygame, the display and
+the mixer once, runs the fixed-timestep loop and switches between scenes
+without tearing anything down. Assets come from the shared reference-counted
+registry, so going back to a scene that was already loaded is instant.
+"""
+import pygame
+
+from engine.assets import assets, image_key, load_image
+from engine.input import live_input
+from engine.loop import TICK_RATE, FixedStepLoop, render_fps
+from engine.music import music
+from engine.overlay import PROFILER_KEY, ProfilerOverlay, profile_path, profiling_enabled
+from engine.pacing import FramePacer, idle_enabled
+from engine.probe import RingProbe, null_probe
+from engine.quality import QualityGovernor, quality_setting
+from engine.sfx import load_sound, sfx, sound_key
+from engine.telemetry import telemetry
+
+DEFAULT_CAPTION = "HELIOS: The Space Weather Game"
+
+
+class Scene:
+    """Base class for a screen of the game. Override the hooks you need."""
+    size = (800, 600)
+    caption = DEFAULT_CAPTION
+
+    def __init__(self):
+        self.app = None
+        self.loaded = False
+        self.next_scene = None  # Name of the scene to switch to when finished
+        self.quality = 0  # Tier from engine.quality, 0 = best
+        self.redraw = True  # While idle, the manager only draws when this is set
+        self._asset_keys = []
+        self._effects = []
+
+    def acquire(self, key, loader):
+        """Acquires an asset from the registry and remembers it for unload()."""
+        asset = assets.acquire(key, loader)
+        self._asset_keys.append(key)
+        return asset
+
+    def acquire_image(self, path, size=None, alpha=True):
+        """Acquires an image; raises pygame.error if it cannot be loaded."""
+        return self.acquire(image_key(path, size, alpha), lambda: load_image(path, size, alpha))
+
+    def define_sound(self, name, paths, priority=0, max_per_frame=1, volume=1.0):
+        """Decodes the variants of a sound effect once and registers it with sfx."""
+        if not sfx.enabled:
+            return
+        sounds = []
+        for path in paths:
+            try:
+                sounds.append(self.acquire(sound_key(path), lambda path=path: load_sound(path)))
+            except (pygame.error, OSError) as e:
+                print(f"Error loading sound '{path}': {e}")
+        sfx.define(name, sounds, priority, max_per_frame, volume)
+        self._effects.append(name)
+
+    def preload(self, preloader):
+        """Queues the assets load() will acquire, so they can be decoded early."""
+
+    def load(self):
+        """Acquires assets. Called once, after the display has the scene's size."""
+
+    def unload(self):
+        """Releases every asset acquired with acquire()."""
+        for key in self._asset_keys:
+            assets.release(key)
+        self._asset_keys = []
+        for name in self._effects:
+            sfx.remove(name)
+        self._effects = []
+
+    def enter(self):
+        """Called every time the scene becomes active."""
+
+    def exit(self):
+        """Called when another scene takes over."""
+
+    def handle_event(self, event):
+        """Handles one pygame event."""
+
+    def update(self, keys):
+        """Advances the simulation by one fixed tick."""
+
+    def draw(self, screen, alpha):
+        """Draws the current state; alpha is the leftover tick fraction."""
+
+    def present(self):
+        """Shows the frame; scenes with dirty-rect rendering override this."""
+        pygame.display.flip()
+
+    def idle_timeout(self):
+        """None while the scene animates; on a static screen, the ms until its next timer (0: none).
+
+        An idle scene is drawn only when redraw is set: the manager sets it on
+        input other than mouse motion, the scene sets it on hover changes.
+        """
+        return None
+
+    def set_quality(self, tier):
+        """Applies a quality tier (0 = best); scenes map it to their own knobs."""
+        self.quality = tier
+
+    def invalidate(self):
+        """Something drew over the screen; repaint all of it next frame."""
+
+    def state_digest(self):
+        """Simulation state that replays check frame by frame (None: not checked)."""
+        return None
+
+    def count_objects(self, probe):
+        """Reports live-object counts to the probe."""
+
+    def finish(self):
+        """Ends the scene: switch to next_scene, or quit if there is none."""
+        if self.next_scene:
+            self.app.switch(self.next_scene)
+        else:
+            self.app.quit()
+
+
+class SceneManager:
+    """Owns the display, mixer, clock and loop, and runs the active scene."""
+
+    def __init__(self, input_source=live_input, probe=null_probe, sim=None, fps=None, recorder=None):
+        pygame.init()
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+        except pygame.error as e:
+            print("Mixer init error:", e)
+        self.input = input_source
+        self.probe = probe
+        self.recorder = recorder  # engine.replay Recorder / Replay, sees every frame
+        self.sim = sim if sim is not None else FixedStepLoop(TICK_RATE)
+        self.fps = render_fps(60) if fps is None else fps
+        self.clock = pygame.time.Clock()
+        self.pacer = FramePacer(self.clock)
+        # Scripted and recorded input cannot wait: those sessions render every frame
+        self.idle = idle_enabled() and hasattr(input_source, "wait")
+        self.screen = None
+        self.scenes = {}
+        self.scene = None
+        self.running = False
+        self._pending = None
+        self.overlay = None
+        auto, tier = quality_setting()
+        self.quality = QualityGovernor(budget_ms=1000.0 / (self.fps or 60), tier=tier, auto=auto)
+        if probe is null_probe and profiling_enabled():
+            self.toggle_profiler()
+        telemetry.start_from_env()
+
+    def add(self, name, scene):
+        self.scenes[name] = scene
+        scene.app = self
+        return scene
+
+    def ensure_display(self, size, caption):
+        """Reuses the window, only changing its mode when the size differs."""
+        if self.screen is None or self.screen.get_size() != tuple(size):
+            self.screen = self.pacer.set_mode(size)
+        pygame.display.set_caption(caption)
+        return self.screen
+
+    def switch(self, name):
+        """Switches to another scene at the end of the current frame."""
+        self._pending = name
+
+    def quit(self):
+        self.running = False
+        # Join the decoder threads so pygame.quit() cannot pull the mixer from under them
+        music.stop(wait=True)
+
+    def toggle_profiler(self):
+        """Shows or hides the profiler overlay, starting to record on first use."""
+        if self.overlay is None:
+            if self.probe is null_probe:
+                self.probe = RingProbe()
+            if not isinstance(self.probe, RingProbe):
+                return  # Someone else (a benchmark) owns the probe
+            self.overlay = ProfilerOverlay(self.probe, visible=False)
+        self.overlay.visible = not self.overlay.visible
+        if not self.overlay.visible and self.scene is not None:
+            self.scene.invalidate()
+
+    def _activate(self, scene):
+        if self.scene is not None:
+            self.scene.exit()
+            self.scene.unload()
+            self.scene.loaded = False
+        scene.app = self
+        self.ensure_display(scene.size, scene.caption)
+        if not scene.loaded:
+            scene.load()
+            scene.loaded = True
+        self.scene = scene
+        scene.enter()
+        scene.set_quality(self.quality.tier)
+        telemetry.event("enter." + type(scene).__name__, self.quality.tier)
+        # The loading frame says nothing about how the scene runs
+        self.quality.reset()
+
+    def run(self, start, max_frames=None):
+        """Runs scenes until quit() (or max_frames). start is a name or a Scene."""
+        self._activate(self.scenes[start] if isinstance(start, str) else start)
+        frames = 0
+        self.running = True
+        while self.running:
+            scene = self.scene
+            probe = self.probe
+            toggle = False
+            idle = scene.idle_timeout() if self.idle else None
+            probe.frame_start()
+            self.input.begin_frame()
+            sfx.begin_frame()
+            if idle is None:
+                events = self.input.events()
+            else:
+                events = self.input.wait(self.pacer.idle_timeout(idle, music.wake_ms()))
+            for event in events:
+                if event.type != pygame.MOUSEMOTION:
+                    scene.redraw = True
+                if event.type == pygame.QUIT:
+                    self.quit()
+                elif event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                    # Applied at frame end so a new probe starts on a frame boundary
+                    toggle = True
+                else:
+                    scene.handle_event(event)
+            keys = self.input.pressed()
+            if scene.quality != self.quality.tier:
+                scene.set_quality(self.quality.tier)
+            probe.lap("events")
+
+            if idle is None:
+                elapsed = self.pacer.tick(self.fps)
+                probe.lap("sleep")
+                for _ in range(self.sim.steps(elapsed)):
+                    scene.update(keys)
+            else:
+                # Nothing moves while idle: the time slept only moves the scene's timers on
+                self.sim.skip(self.clock.tick())
+                scene.update(keys)
+            probe.lap("update")
+
+            if idle is None or scene.redraw:
+                # Set after a rendered frame, so the first idle frame draws the still screen
+                scene.redraw = idle is None
+                scene.draw(self.screen, self.sim.alpha)
+                overlay = self.overlay
+                if overlay is not None and overlay.visible:
+                    overlay_rect = overlay.draw(self.screen)
+                probe.lap("draw")
+                scene.present()
+                if overlay is not None and overlay.visible:
+                    # Dirty-rect scenes only present what they changed
+                    pygame.display.update(overlay_rect)
+            music.update()
+            probe.lap("flip")
+            if probe.enabled:
+                scene.count_objects(probe)
+                probe.count("quality", self.quality.tier)
+            probe.frame_end()
+            if self.recorder is not None:
+                self.recorder.end_frame(scene)
+            # Work time between the last two clock ticks, without the sleep
+            if idle is None:
+                work_ms = self.clock.get_rawtime()
+                telemetry.event("frame", work_ms, self.clock.get_time())
+                if self.quality.observe(work_ms):
+                    telemetry.event("quality", self.quality.tier, self.quality.mean_ms)
+            else:
+                # Sleeps are not frame times
+                telemetry.event("idle", idle, self.clock.get_time())
+            if toggle:
+                self.toggle_profiler()
+
+            if self._pending is not None:
+                name, self._pending = self._pending, None
+                self._activate(self.scenes[name])
+
+            frames += 1
+            if max_frames is not None and frames >= max_frames:
+                self.quit()
+
+        if self.recorder is not None:
+            self.recorder.close()
+        telemetry.close()
+        if self.overlay is not None:
+            path = profile_path()
+            try:
+                count = self.probe.export(path)
+                print(f"Profiler: wrote {count} frames to {path}")
+            except OSError as e:
+                print(f"Profiler: could not write {path}: {e}")
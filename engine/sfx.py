@@ -0,0 +1,168 @@
+"""Sound effects with a pre-decoded PCM cache and a pooled set of channels.
+
+pygame.mixer.Sound decodes the whole MP3 into PCM when it is created, so
+every effect is created once (through the asset registry) and playing it
+afterwards costs no decoding. If HELIOS_SFX_CACHE names a directory, the
+decoded PCM is also written there as a WAV file and read back raw on the
+next start, skipping the MP3 decoder entirely.
+
+SoundBank owns a fixed number of mixer channels. play() picks a free
+channel, or steals the one playing the lowest-priority (then oldest) sound
+if the new sound is at least as important. Each effect can only start
+max_per_frame times per frame, so twenty particles hitting at once play
+one impact instead of twenty.
+"""
+import os
+import random
+import wave
+
+import pygame
+
+DEFAULT_CHANNELS = 8
+
+
+def sound_key(path):
+    return ("sound", path)
+
+
+def _cache_path(cache_dir, path, mixer_format):
+    freq, size, channels = mixer_format
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{stat.st_mtime_ns}-{freq}-{size}-{channels}.wav")
+
+
+def load_sound(path, cache_dir=None):
+    """Decodes path into a Sound, going through the WAV cache when enabled."""
+    if cache_dir is None:
+        cache_dir = os.environ.get("HELIOS_SFX_CACHE")
+    mixer_format = pygame.mixer.get_init()
+    # Only signed 16-bit maps directly onto a WAV file
+    if not cache_dir or not mixer_format or mixer_format[1] != -16:
+        return pygame.mixer.Sound(path)
+
+    cached = _cache_path(cache_dir, path, mixer_format)
+    if os.path.exists(cached):
+        with wave.open(cached, "rb") as f:
+            return pygame.mixer.Sound(buffer=f.readframes(f.getnframes()))
+
+    sound = pygame.mixer.Sound(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cached + ".tmp"
+        with wave.open(tmp, "wb") as f:
+            f.setnchannels(mixer_format[2])
+            f.setsampwidth(2)
+            f.setframerate(mixer_format[0])
+            f.writeframes(sound.get_raw())
+        os.replace(tmp, cached)
+    except OSError as e:
+        print(f"Could not write sound cache for {path}: {e}")
+    return sound
+
+
+class Effect:
+    """One named effect: a few sound variants sharing a priority and rate limit."""
+    __slots__ = ("sounds", "priority", "max_per_frame", "volume", "played")
+
+    def __init__(self, sounds, priority, max_per_frame, volume):
+        self.sounds = sounds
+        self.priority = priority
+        self.max_per_frame = max_per_frame
+        self.volume = volume
+        self.played = 0
+
+
+class SoundBank:
+    """Plays named effects on a fixed pool of channels."""
+
+    def __init__(self, channels=DEFAULT_CHANNELS):
+        self.channel_count = channels
+        self._channels = None
+        self._voices = []  # (priority, start frame) of what each channel last started
+        self._effects = {}
+        self._touched = []
+        # Own RNG so picking variants never disturbs the game's seeded random
+        self._rng = random.Random()
+        self.frame = 0
+        self.plays = 0
+        self.steals = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return pygame.mixer.get_init() is not None
+
+    def _ensure_channels(self):
+        if self._channels is None:
+            if pygame.mixer.get_num_channels() < self.channel_count:
+                pygame.mixer.set_num_channels(self.channel_count)
+            self._channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+            self._voices = [(0, 0)] * self.channel_count
+        return self._channels
+
+    def define(self, name, sounds, priority=0, max_per_frame=1, volume=1.0):
+        """Registers an effect; play(name) picks one of sounds at random."""
+        sounds = [s for s in sounds if s is not None]
+        if not sounds:
+            self._effects.pop(name, None)
+            return
+        for sound in sounds:
+            sound.set_volume(volume)
+        self._effects[name] = Effect(sounds, priority, max_per_frame, volume)
+
+    def remove(self, name):
+        self._effects.pop(name, None)
+
+    def begin_frame(self):
+        """Resets the per-frame rate limits. Called once per rendered frame."""
+        self.frame += 1
+        for effect in self._touched:
+            effect.played = 0
+        self._touched.clear()
+
+    def play(self, name):
+        """Starts an effect; returns the channel, or None if it was dropped."""
+        effect = self._effects.get(name)
+        if effect is None or not self.enabled:
+            return None
+        if effect.played >= effect.max_per_frame:
+            self.limited += 1
+            return None
+
+        channels = self._ensure_channels()
+        index = self._pick_channel(effect.priority)
+        if index is None:
+            return None
+        channel = channels[index]
+        channel.play(effect.sounds[0] if len(effect.sounds) == 1 else self._rng.choice(effect.sounds))
+        self._voices[index] = (effect.priority, self.frame)
+        if effect.played == 0:
+            self._touched.append(effect)
+        effect.played += 1
+        self.plays += 1
+        return channel
+
+    def _pick_channel(self, priority):
+        victim = None
+        for i, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return i
+            if victim is None or self._voices[i] < self._voices[victim]:
+                victim = i
+        if self._voices[victim][0] > priority:
+            return None
+        self.steals += 1
+        return victim
+
+    def stop_all(self):
+        if self._channels is not None:
+            for channel in self._channels:
+                channel.stop()
+
+    def stats(self):
+        return {"plays": self.plays, "steals": self.steals, "limited": self.limited}
+
+
+# Shared by every scene
+sfx = SoundBank()
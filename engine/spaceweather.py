@@ -0,0 +1,448 @@
+"""Space-weather data feed: archive time series -> per-tick spawn schedule.
+
+lvl1 can spawn its plasmas from real solar data instead of a timer. Point
+HELIOS_SPACE_WEATHER at a directory of archive files:
+
+- GOES X-ray flux (file name contains "xray" or "xrs"; a "flux" / "xrsb"
+  column, W/m^2)
+- solar wind (file name contains "wind", "plasma" or "swepam"; "speed"
+  in km/s and, if present, "density" in protons/cm^3)
+
+Files can be CSV (comment lines starting with # are skipped) or JSON: an
+array of objects, an array of rows whose first row is the header (the NOAA
+SWPC layout) or JSON Lines. They are read streaming, through mmap, and a
+multi-year CSV is bisected straight to the start time instead of parsed
+from the top.
+
+The archive is never touched in the frame loop. build_schedule() bins the
+samples into game ticks (HELIOS_SPACE_WEATHER_SPEEDUP archive seconds per
+game second, from HELIOS_SPACE_WEATHER_START or the first sample) and
+turns them into two bytes per tick:
+
+    byte 0: bit 7 = an X-ray flare (M class or above) starts on this tick,
+            bits 0-6 = plasmas to spawn
+    byte 1: extra plasma speed from the solar wind, in 0.1 px/tick
+
+The result is cached on disk (spawn_schedule.bin, or HELIOS_SCHEDULE_CACHE)
+with a key of the source files' sizes and mtimes and the build settings,
+and SpawnSchedule reads it back through mmap with O(1) lookups per tick.
+
+    python -m engine.spaceweather data/space_weather --start 2024-05-10 --speedup 600
+"""
+import argparse
+import codecs
+import csv
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime, timezone
+
+MAGIC = b"HSWS"
+VERSION = 1
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE = os.path.join(ROOT, "spawn_schedule.bin")
+_HEADER = struct.Struct("<4sH20sIH")  # magic, version, key, ticks, tick rate
+
+TIME_FIELDS = ("time_tag", "time", "timestamp", "date", "datetime")
+FLUX_FIELDS = ("flux", "xrsb", "xrsb_flux", "b_flux", "long")
+SPEED_FIELDS = ("speed", "proton_speed", "bulk_speed", "v")
+DENSITY_FIELDS = ("density", "proton_density", "n", "np")
+
+BASE_SPAWNS_PER_S = 4.0      # What lvl1's timer spawns at the start of a game
+QUIET_DENSITY = 5.0          # protons/cm^3
+QUIET_SPEED = 400.0          # km/s
+M_CLASS = 1e-5               # W/m^2
+FLARE_BURSTS = ((1e-4, 8), (M_CLASS, 4))  # (flux, extra plasmas): X class, M class
+FLUX_FLOOR = 1e-9            # W/m^2, below any real X-ray background; zero readings are clamped to it
+
+
+def data_dir():
+    return os.environ.get("HELIOS_SPACE_WEATHER")
+
+
+def cache_path():
+    return os.environ.get("HELIOS_SCHEDULE_CACHE", DEFAULT_CACHE)
+
+
+def parse_time(text):
+    """Epoch seconds from an ISO 8601 string or a number."""
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        pass
+    text = text.strip().replace(" ", "T", 1)
+    stamp = datetime.fromisoformat(text)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def _pick(fields, candidates):
+    """Index of the first field named like one of candidates, or None."""
+    lowered = [f.strip().lower() for f in fields]
+    for name in candidates:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+# --- Streaming readers ---
+
+def _csv_lines(mm, offset=0):
+    mm.seek(offset)
+    for line in iter(mm.readline, b""):
+        line = line.decode("utf-8", "replace")
+        if line.strip() and not line.startswith("#"):
+            yield line
+
+
+def _csv_seek(mm, data_start, time_index, start):
+    """Byte offset of the first line at or after start, by bisection (sorted files)."""
+    size = len(mm)
+
+    def line_at(p):
+        # First line starting at or after byte p
+        return p if p <= data_start else (mm.find(b"\n", p - 1, size) + 1 or size)
+
+    def before(p):
+        s = line_at(p)
+        if s >= size:
+            return False
+        e = mm.find(b"\n", s, size)
+        line = mm[s:e if e >= 0 else size].decode("utf-8", "replace")
+        try:
+            return parse_time(next(csv.reader([line]))[time_index]) < start
+        except (ValueError, IndexError, StopIteration):
+            return True  # Comment or broken line: keep looking further on
+
+    lo, hi = data_start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if before(mid):
+            lo = mid + 1
+        else:
+            hi = mid
+    return line_at(lo)
+
+
+def iter_csv(path, fields, start=None):
+    """Yields (time, {field: value}) from a CSV, seeking to start when given."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = _csv_lines(mm)
+        header = next(csv.reader([next(lines, "")]))
+        data_start = mm.tell()
+        time_index = _pick(header, TIME_FIELDS)
+        columns = {name: _pick(header, candidates) for name, candidates in fields.items()}
+        if time_index is None:
+            raise ValueError(f"{path}: no time column in {header}")
+        if start is not None:
+            lines = _csv_lines(mm, _csv_seek(mm, data_start, time_index, start))
+        for row in csv.reader(lines):
+            try:
+                t = parse_time(row[time_index])
+            except (ValueError, IndexError):
+                continue
+            yield t, {name: row[i] for name, i in columns.items() if i is not None and i < len(row)}
+
+
+def iter_json_records(path, chunk_size=1 << 20):
+    """Yields the elements of a top-level JSON array (or JSON Lines) one at a time."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        state = {"offset": 0, "buf": "", "pos": 0}
+
+        def refill():
+            """Appends the next chunk; False at the end of the file."""
+            offset = state["offset"]
+            if offset >= len(mm):
+                return False
+            chunk = mm[offset:offset + chunk_size]
+            state["offset"] = offset + len(chunk)
+            state["buf"] = state["buf"][state["pos"]:] + text_decoder.decode(chunk, final=state["offset"] >= len(mm))
+            state["pos"] = 0
+            return True
+
+        refill()
+        buf = state["buf"].lstrip()
+        in_array = buf.startswith("[")
+        state["buf"], state["pos"] = (buf[1:] if in_array else buf), 0
+        while True:
+            buf, pos = state["buf"], state["pos"]
+            # Skip whitespace and the commas between elements
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            state["pos"] = pos
+            if pos < len(buf) and buf[pos] == "]" and in_array:
+                return
+            if pos >= len(buf):
+                if refill():
+                    continue
+                return
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if refill():
+                    continue
+                raise
+            # A number cut at the chunk edge decodes fine but short: only trust it with data after it
+            if end == len(buf) and refill():
+                continue
+            state["pos"] = end
+            yield record
+
+
+def iter_json(path, fields, start=None):
+    """Yields (time, {field: value}) from a JSON archive."""
+    header = None
+    for record in iter_json_records(path):
+        if isinstance(record, list):
+            if header is None and all(isinstance(v, str) for v in record):
+                header = record
+                continue
+            if header is None:
+                continue
+            record = dict(zip(header, record))
+        if not isinstance(record, dict):
+            continue
+        keys = list(record)
+        time_index = _pick(keys, TIME_FIELDS)
+        if time_index is None:
+            continue
+        try:
+            t = parse_time(record[keys[time_index]])
+        except ValueError:
+            continue
+        if start is not None and t < start:
+            continue
+        values = {}
+        for name, candidates in fields.items():
+            i = _pick(keys, candidates)
+            if i is not None:
+                values[name] = record[keys[i]]
+        yield t, values
+
+
+def iter_series(path, fields, start=None):
+    reader = iter_json if path.lower().endswith((".json", ".jsonl")) else iter_csv
+    return reader(path, fields, start)
+
+
+def find_sources(directory):
+    """{"xray": [paths], "wind": [paths]} from the file names in directory."""
+    sources = {"xray": [], "wind": []}
+    for name in sorted(os.listdir(directory)):
+        lowered = name.lower()
+        if not lowered.endswith((".csv", ".json", ".jsonl")):
+            continue
+        path = os.path.join(directory, name)
+        if "xray" in lowered or "xrs" in lowered:
+            sources["xray"].append(path)
+        elif any(word in lowered for word in ("wind", "plasma", "swepam")):
+            sources["wind"].append(path)
+    return sources
+
+
+# --- Schedule ---
+
+def _float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    # Archives use -9999 / -99999 for missing samples
+    return value if value >= 0 and math.isfinite(value) else None
+
+
+def _bin(paths, fields, start, speedup, ticks, tick_rate, reduce):
+    """Per-tick values of each field (None where no sample landed), binned from the archives."""
+    end = start + ticks * speedup / tick_rate
+    binned = {name: [None] * ticks for name in fields}
+    counts = {name: array("I", bytes(4 * ticks)) for name in fields}
+    for path in paths:
+        for t, values in iter_series(path, fields, start):
+            if t < start:
+                continue
+            if t >= end:
+                break  # Archives are in time order: the rest is past the window
+            tick = int((t - start) * tick_rate / speedup)
+            for name, raw in values.items():
+                value = _float(raw)
+                if value is None:
+                    continue
+                old = binned[name][tick]
+                binned[name][tick] = value if old is None else reduce(old, value)
+                counts[name][tick] += 1
+    if reduce is _add:
+        for name in fields:
+            column, count = binned[name], counts[name]
+            for i in range(ticks):
+                if count[i] > 1:
+                    column[i] /= count[i]
+    return binned
+
+
+def _add(a, b):
+    return a + b
+
+
+def _fill(column, default):
+    """Carries the last sample forward over ticks without one."""
+    last = next((v for v in column if v is not None), default)
+    for i, value in enumerate(column):
+        if value is None:
+            column[i] = last
+        else:
+            last = value
+    return column
+
+
+def first_time(sources):
+    for path in sources.get("xray", []) + sources.get("wind", []):
+        for t, _ in iter_series(path, {}):
+            return t
+    raise ValueError("the space-weather archives have no samples")
+
+
+def build_schedule(sources, start=None, speedup=600, ticks=36000, tick_rate=60):
+    """Spawn schedule bytes (2 per tick) for ticks ticks of game time."""
+    if ticks <= 0:
+        raise ValueError(f"a spawn schedule needs at least one tick, not {ticks}")
+    if start is None:
+        start = first_time(sources)
+    flux = _fill(_bin(sources.get("xray", []), {"flux": FLUX_FIELDS}, start, speedup, ticks, tick_rate, max)["flux"], 1e-7)
+    wind = _bin(sources.get("wind", []), {"speed": SPEED_FIELDS, "density": DENSITY_FIELDS},
+                start, speedup, ticks, tick_rate, _add)
+    speed = _fill(wind["speed"], QUIET_SPEED)
+    density = _fill(wind["density"], QUIET_DENSITY)
+
+    schedule = bytearray(2 * ticks)
+    owed = 0.0
+    flaring = False
+    for i in range(ticks):
+        # Denser, faster wind means more plasma; a bright X-ray background adds a little
+        rate = BASE_SPAWNS_PER_S / tick_rate
+        rate *= math.sqrt(max(density[i], 0.1) / QUIET_DENSITY) * (speed[i] / QUIET_SPEED)
+        rate *= 1.0 + max(0.0, math.log10(max(flux[i], FLUX_FLOOR) / 1e-6)) * 0.5
+        owed += rate
+        count = int(owed)
+        owed -= count
+        flag = 0
+        if flux[i] >= M_CLASS and not flaring:
+            flag = 0x80
+            count += next(extra for level, extra in FLARE_BURSTS if flux[i] >= level)
+        flaring = flux[i] >= M_CLASS
+        schedule[2 * i] = flag | min(count, 0x7F)
+        schedule[2 * i + 1] = min(255, max(0, int(round((speed[i] - QUIET_SPEED) / 10))))
+    return bytes(schedule)
+
+
+def schedule_key(sources, start, speedup, ticks, tick_rate):
+    files = [(os.path.abspath(p), os.path.getsize(p), os.stat(p).st_mtime_ns)
+             for kind in sorted(sources) for p in sources[kind]]
+    text = json.dumps([VERSION, files, start, speedup, ticks, tick_rate])
+    return hashlib.sha1(text.encode()).digest()
+
+
+class SpawnSchedule:
+    """Memory-mapped schedule: at(tick) -> (plasmas, speed bonus px/tick, flare starts)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key, self.ticks, self.tick_rate = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or not self.ticks:
+            self.close()
+            raise ValueError(f"{path} is not a spawn schedule")
+        self._data = memoryview(self._mmap)[_HEADER.size:_HEADER.size + 2 * self.ticks]
+
+    def __len__(self):
+        return self.ticks
+
+    def at(self, tick):
+        """Lookup for one game tick; the schedule loops when the game outlasts it."""
+        i = 2 * (tick % self.ticks)
+        data = self._data
+        first = data[i]
+        return first & 0x7F, data[i + 1] / 10.0, bool(first & 0x80)
+
+    def close(self):
+        self._data = None
+        self._mmap.close()
+
+
+def write_schedule(path, key, data, tick_rate):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, key, len(data) // 2, tick_rate))
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_schedule(directory=None, start=None, speedup=None, ticks=36000, tick_rate=60, path=None):
+    """The cached schedule for the archives in directory, rebuilt if stale; None without data.
+
+    Call it while loading a scene: a rebuild parses the archives. Archives
+    that cannot be parsed raise ValueError, like missing ones.
+    """
+    directory = directory or data_dir()
+    if not directory:
+        return None
+    if start is None and os.environ.get("HELIOS_SPACE_WEATHER_START"):
+        start = parse_time(os.environ["HELIOS_SPACE_WEATHER_START"])
+    if speedup is None:
+        speedup = float(os.environ.get("HELIOS_SPACE_WEATHER_SPEEDUP", "600"))
+    path = path or cache_path()
+    sources = find_sources(directory)
+    if not sources["xray"] and not sources["wind"]:
+        raise ValueError(f"no X-ray or solar wind archives in {directory}")
+    key = schedule_key(sources, start, speedup, ticks, tick_rate)
+    if os.path.exists(path):
+        try:
+            schedule = SpawnSchedule(path)
+            if schedule.key == key:
+                return schedule
+            schedule.close()
+        except (OSError, ValueError, struct.error):
+            pass
+    try:
+        data = build_schedule(sources, start, speedup, ticks, tick_rate)
+    except csv.Error as e:
+        raise ValueError(f"malformed space-weather archive in {directory}: {e}") from e
+    write_schedule(path, key, data, tick_rate)
+    return SpawnSchedule(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build lvl1's spawn schedule from space-weather archives.")
+    parser.add_argument("directory", nargs="?", default=data_dir())
+    parser.add_argument("--start", help="Archive time at the start of a game (ISO 8601; default: first sample)")
+    parser.add_argument("--speedup", type=float, help="Archive seconds per game second (default 600)")
+    parser.add_argument("--minutes", type=float, default=10, help="Game minutes covered before the schedule loops")
+    parser.add_argument("--out", help="Schedule file (default: HELIOS_SCHEDULE_CACHE or spawn_schedule.bin)")
+    args = parser.parse_args(argv)
+    if not args.directory:
+        parser.error("give the archive directory or set HELIOS_SPACE_WEATHER")
+
+    start = parse_time(args.start) if args.start else None
+    try:
+        schedule = load_schedule(args.directory, start, args.speedup, int(args.minutes * 60 * 60), path=args.out)
+    except ValueError as e:
+        parser.error(str(e))
+    spawns = flares = 0
+    for tick in range(len(schedule)):
+        count, _, flare = schedule.at(tick)
+        spawns += count
+        flares += flare
+    print(f"{len(schedule)} ticks, {spawns} plasmas, {flares} X-ray flares -> {args.out or cache_path()}")
+    schedule.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Process-wide cache of scaled surfaces.
+
+Scaling a large image every frame (the growing sun) or on every spawn
+(plasmas, solar particles) is expensive. The cache keys each scaled copy on
+(source, size), rounds sizes up to a bucket so nearby sizes share one entry,
+and evicts the least recently used entries once the memory budget is spent.
+Sources are only referenced weakly: once the last reference to a source
+goes (say the asset registry unloads it), its scaled copies go with it.
+"""
+import os
+import weakref
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_BUDGET_BYTES = int(os.environ.get("HELIOS_SCALE_CACHE_MB", "32")) * 1024 * 1024
+DEFAULT_BUCKET = 4
+
+
+def quantize_size(size, bucket):
+    """Rounds a (width, height) pair up to the next multiple of bucket."""
+    if bucket <= 1:
+        return max(1, int(size[0])), max(1, int(size[1]))
+    w = max(bucket, -(-int(size[0]) // bucket) * bucket)
+    h = max(bucket, -(-int(size[1]) // bucket) * bucket)
+    return w, h
+
+
+def surface_bytes(surface):
+    """Approximate pixel memory used by a surface."""
+    w, h = surface.get_size()
+    return w * h * surface.get_bytesize()
+
+
+class ScaledSurfaceCache:
+    """LRU cache of scaled surfaces bounded by a memory budget in bytes."""
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, bucket=DEFAULT_BUCKET):
+        self.budget_bytes = budget_bytes
+        self.bucket = bucket
+        self._entries = OrderedDict()
+        self._by_source = {}  # ("surface", id(source)) -> its cache keys
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, source, size, key=None, exact=False, smooth=False):
+        """Returns source scaled to size, creating and caching it if needed.
+
+        key identifies the source when the surface object itself is not a
+        stable identity (for example a path reloaded from disk). exact=True
+        skips bucketing for assets that must match a fixed size.
+        """
+        size = (max(1, int(size[0])), max(1, int(size[1]))) if exact else quantize_size(size, self.bucket)
+        # id() instead of the surface, so the key does not keep the source alive
+        cache_key = (key if key is not None else ("surface", id(source)), size, smooth)
+
+        scaled = self._entries.get(cache_key)
+        if scaled is not None:
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return scaled
+
+        self.misses += 1
+        if smooth:
+            scaled = pygame.transform.smoothscale(source, size)
+        else:
+            scaled = pygame.transform.scale(source, size)
+        self._entries[cache_key] = scaled
+        self.used_bytes += surface_bytes(scaled)
+        if key is None:
+            self._track(source, cache_key)
+        self._evict()
+        return scaled
+
+    def _track(self, source, cache_key):
+        source_key = cache_key[0]
+        keys = self._by_source.get(source_key)
+        if keys is None:
+            keys = self._by_source[source_key] = set()
+            # Runs when the source is freed, before its id can be reused
+            weakref.finalize(source, self._forget, source_key).atexit = False
+        keys.add(cache_key)
+
+    def _forget(self, source_key):
+        """Drops every scaled copy of a source that no longer exists."""
+        for cache_key in self._by_source.pop(source_key, ()):
+            scaled = self._entries.pop(cache_key, None)
+            if scaled is not None:
+                self.used_bytes -= surface_bytes(scaled)
+
+    def _evict(self):
+        # The newest entry is never evicted, even if it alone exceeds the budget
+        while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+            cache_key, old = self._entries.popitem(last=False)
+            self.used_bytes -= surface_bytes(old)
+            self.evictions += 1
+            keys = self._by_source.get(cache_key[0])
+            if keys is not None:
+                keys.discard(cache_key)
+
+    def configure(self, budget_bytes=None, bucket=None):
+        """Changes the budget and/or bucket size; shrinking evicts immediately."""
+        if bucket is not None and bucket != self.bucket:
+            self.bucket = bucket
+            self.clear()
+        if budget_bytes is not None:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def clear(self):
+        self._entries.clear()
+        for keys in self._by_source.values():
+            keys.clear()
+        self.used_bytes = 0
+
+    def stats(self):
+        """Returns hit/miss counters and memory usage as a dict."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by the whole process
+scaled_cache = ScaledSurfaceCache()
+
+
+def get_scaled(source, size, key=None, exact=False, smooth=False):
+    """Shortcut for scaled_cache.get()."""
+    return scaled_cache.get(source, size, key=key, exact=exact, smooth=smooth)
@@ -0,0 +1,358 @@
+"""Session telemetry: gameplay and performance events for the kiosks.
+
+The game records events through the shared `telemetry` object:
+
+    telemetry.event("flare", flare_cycles, elapsed_s)
+
+Each event is a fixed-size record (seconds since the session started,
+event kind, an int and a float) packed into a preallocated buffer, so
+recording one costs a struct.pack_into and no allocation or I/O. Full
+buffers (or every FLUSH_INTERVAL seconds) are handed to a background
+writer thread and the game carries on with a spare buffer. If the writer
+ever falls behind and no buffer is free, events are dropped and counted;
+the game loop never waits for the disk.
+
+File layout (little endian), one file per session, rotated by size:
+
+    header: b"HTLM" | version u16 | session id u64 | start time f64 (epoch)
+    block:  type u8 | length u32 | payload
+            NAMES:   JSON {kind id: name}, written before the first use of a kind
+            RECORDS: length / 18 records of  t f64 | kind u16 | a i32 | b f32
+
+The SceneManager records a "frame" event every frame (a = work ms without
+the clock's sleep, b = frame interval ms), quality-tier changes and scene
+entries; the levels record flares, lives lost, repairs, restarts, etc.
+
+HELIOS_TELEMETRY turns it on: a file path, or a directory to get one file
+per session. HELIOS_TELEMETRY_MAX_MB (default 8) sets the rotation size.
+
+    python -m engine.telemetry summary telemetry/*.htl
+    python -m engine.telemetry dump telemetry/helios-20250101-120000-4242.htl > events.csv
+"""
+import argparse
+import glob
+import json
+import os
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+from time import perf_counter
+
+from engine.loop import TICK_RATE
+from engine.quality import TIERS
+
+MAGIC = b"HTLM"
+VERSION = 1
+NAMES, RECORDS = 1, 2
+RECORD = struct.Struct("<dHif")
+_HEADER = struct.Struct("<4sHQd")
+_BLOCK = struct.Struct("<BI")
+
+BUFFER_RECORDS = 4096
+BUFFERS = 3
+FLUSH_INTERVAL = 1.0  # Seconds between hand-offs to the writer
+BACKUPS = 5
+HITCH_MS = 1000.0 / 30  # Frames slower than 30 FPS count as hitches
+I32_MIN, I32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def telemetry_path():
+    return os.environ.get("HELIOS_TELEMETRY")
+
+
+def max_bytes():
+    return int(float(os.environ.get("HELIOS_TELEMETRY_MAX_MB", "8")) * 1024 * 1024)
+
+
+def session_file(path):
+    """path itself, or a new per-session file name when path is a directory.
+
+    Names carry the pid (and a counter if needed), so sessions started in
+    the same second never overwrite each other.
+    """
+    if path.endswith(("/", os.sep)) or os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+        stem = time.strftime("helios-%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        name, n = os.path.join(path, stem + ".htl"), 1
+        while os.path.exists(name):
+            n += 1
+            name = os.path.join(path, f"{stem}-{n}.htl")
+        return name
+    return path
+
+
+class Telemetry:
+    """Records events into preallocated buffers; a writer thread saves them."""
+
+    def __init__(self, buffer_records=BUFFER_RECORDS, buffers=BUFFERS):
+        self.enabled = False
+        self.path = None
+        self.dropped = 0
+        self._buffer_bytes = buffer_records * RECORD.size
+        self._buffer_count = buffers
+        self._ids = {}
+        self._thread = None
+
+    def start(self, path, max_size=None, backups=BACKUPS):
+        """Opens path (rotating it when it grows past max_size) and starts the writer."""
+        if self.enabled:
+            return
+        try:
+            self.path = session_file(path)
+            writer = _Writer(self.path, random.getrandbits(63), time.time(), max_size or max_bytes(), backups)
+        except OSError as e:
+            # No telemetry is better than no game
+            print(f"Telemetry: could not write {path}: {e}")
+            return
+        self._free = queue.Queue()
+        for _ in range(self._buffer_count - 1):
+            self._free.put(bytearray(self._buffer_bytes))
+        self._buffer = bytearray(self._buffer_bytes)
+        self._used = 0
+        self._pending = queue.Queue()
+        self._ids = {}
+        self.dropped = 0
+        self.session = writer.session
+        self._t0 = perf_counter()
+        self._last_flush = self._t0
+        self._writer = writer
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        self.enabled = True
+
+    def start_from_env(self):
+        path = telemetry_path()
+        if path and not self.enabled:
+            self.start(path)
+
+    def _kind(self, name):
+        kind = self._ids[name] = len(self._ids)
+        self._pending.put((NAMES, {kind: name}))
+        return kind
+
+    def event(self, name, a=0, b=0.0):
+        """Records one event. Cheap, never blocks, never raises.
+
+        a saturates at the record's i32 range; an event that still cannot be
+        packed (b too large for f32, not a number) is counted as dropped.
+        """
+        if not self.enabled:
+            return
+        kind = self._ids.get(name)
+        if kind is None:
+            kind = self._kind(name)
+        now = perf_counter()
+        if self._used + RECORD.size > self._buffer_bytes or now - self._last_flush >= FLUSH_INTERVAL:
+            self.flush(now)
+            if self._used + RECORD.size > self._buffer_bytes:
+                self.dropped += 1
+                return
+        try:
+            a = int(a)
+            if not I32_MIN <= a <= I32_MAX:
+                a = I32_MAX if a > 0 else I32_MIN
+            RECORD.pack_into(self._buffer, self._used, now - self._t0, kind, a, float(b))
+        except (struct.error, OverflowError, TypeError, ValueError):
+            self.dropped += 1
+            return
+        self._used += RECORD.size
+
+    def flush(self, now=None):
+        """Hands the current buffer to the writer if a spare one is free."""
+        self._last_flush = perf_counter() if now is None else now
+        if not self._used:
+            return
+        try:
+            spare = self._free.get_nowait()
+        except queue.Empty:
+            return  # The writer is behind: keep filling (or dropping into) this one
+        self._pending.put((RECORDS, (self._buffer, self._used)))
+        self._buffer, self._used = spare, 0
+
+    def close(self):
+        """Flushes what is left and waits for the writer; call at the end of a session."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._used:
+            self._pending.put((RECORDS, (self._buffer, self._used)))
+            self._used = 0
+        if self.dropped:
+            kind = self._ids.get("dropped")
+            if kind is None:
+                kind = self._kind("dropped")
+            last = RECORD.pack(perf_counter() - self._t0, kind, self.dropped, 0.0)
+            self._pending.put((RECORDS, (bytearray(last), len(last))))
+        self._pending.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        writer = self._writer
+        while True:
+            item = self._pending.get()
+            if item is None:
+                writer.close()
+                return
+            kind, payload = item
+            if writer.file is not None:
+                try:
+                    if kind == NAMES:
+                        writer.names(payload)
+                    else:
+                        buffer, used = payload
+                        writer.records(memoryview(buffer)[:used])
+                except (OSError, ValueError) as e:
+                    print(f"Telemetry: could not write {writer.path}: {e}")
+                    # A failed rotation leaves no open file: stop writing, keep recycling buffers
+                    if writer.file is None or writer.file.closed:
+                        writer.file = None
+            if kind == RECORDS:
+                self._free.put(payload[0])
+
+
+class _Writer:
+    """Owned by the writer thread: appends blocks and rotates the file."""
+
+    def __init__(self, path, session, started, max_size, backups):
+        self.path = path
+        self.session = session
+        self.started = started
+        self.max_size = max_size
+        self.backups = backups
+        self.kinds = {}
+        self.file = None
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, self.session, self.started))
+        if self.kinds:
+            # Every file can be read on its own
+            self._block(NAMES, json.dumps(self.kinds).encode())
+
+    def _block(self, kind, payload):
+        self.file.write(_BLOCK.pack(kind, len(payload)))
+        self.file.write(payload)
+
+    def names(self, kinds):
+        self.kinds.update(kinds)
+        self._block(NAMES, json.dumps(kinds).encode())
+
+    def records(self, data):
+        self._block(RECORDS, data)
+        self.file.flush()
+        if self.file.tell() >= self.max_size:
+            self._rotate()
+
+    def _rotate(self):
+        self.file.close()
+        self.file = None
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+# Shared by the whole process
+telemetry = Telemetry()
+
+
+# --- Reading ---
+
+def read_events(path):
+    """Yields (session, t, name, a, b) for every record in a telemetry file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, session, started = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a telemetry file")
+    names = {}
+    offset = _HEADER.size
+    while offset + _BLOCK.size <= len(data):
+        kind, length = _BLOCK.unpack_from(data, offset)
+        offset += _BLOCK.size
+        payload = data[offset:offset + length]
+        offset += length
+        if len(payload) < length:
+            break  # Cut short by a crash: keep what came before
+        if kind == NAMES:
+            names.update({int(k): v for k, v in json.loads(payload).items()})
+        elif kind == RECORDS:
+            for t, kind_id, a, b in RECORD.iter_unpack(payload):
+                yield session, t, names.get(kind_id, f"kind{kind_id}"), a, b
+
+
+def _percentile(sorted_values, pct):
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(paths):
+    """Aggregates frame times and event counts over one or more files."""
+    sessions = set()
+    counts = {}
+    frames = []
+    repairs = []
+    tiers = {}  # Frames spent at each quality tier
+    tier = 0
+    dropped = 0
+    for path in paths:
+        for session, _, name, a, b in read_events(path):
+            sessions.add(session)
+            counts[name] = counts.get(name, 0) + 1
+            if name == "frame":
+                frames.append(b)
+                tiers[tier] = tiers.get(tier, 0) + 1
+            elif name == "quality" or name.startswith("enter."):
+                tier = a
+            elif name == "repair":
+                repairs.append(a / TICK_RATE)
+            elif name == "dropped":
+                dropped += a
+    summary = {"sessions": len(sessions), "events": counts, "dropped": dropped,
+               "quality_frames": {TIERS[t]: n for t, n in sorted(tiers.items())}}
+    if frames:
+        ordered = sorted(frames)
+        summary["frame_ms"] = {
+            "frames": len(frames),
+            "mean": round(sum(frames) / len(frames), 3),
+            "p50": round(_percentile(ordered, 50), 3),
+            "p95": round(_percentile(ordered, 95), 3),
+            "p99": round(_percentile(ordered, 99), 3),
+            "max": round(ordered[-1], 3),
+            "hitches": sum(1 for ms in frames if ms > HITCH_MS),
+        }
+    if repairs:
+        summary["repair_s"] = {"count": len(repairs), "mean": round(sum(repairs) / len(repairs), 2),
+                               "min": round(min(repairs), 2), "max": round(max(repairs), 2)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read HELIOS telemetry files.")
+    parser.add_argument("command", choices=("summary", "dump"))
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+    paths = sorted({p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])})
+
+    if args.command == "summary":
+        print(json.dumps(summarize(paths), indent=2))
+        return 0
+    print("session,t,event,a,b")
+    for path in paths:
+        for session, t, name, a, b in read_events(path):
+            print(f"{session},{t:.4f},{name},{a},{b:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
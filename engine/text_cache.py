@@ -0,0 +1,95 @@
+"""Font registry and rendered-text cache.
+
+Fonts are created once per (name, size) and rendered strings are kept in a
+bounded LRU keyed by (font, text, color, antialias), so static labels are
+rasterized once and then only blitted. Counters are composed from cached
+digit glyphs instead of adding one entry per distinct number.
+"""
+from collections import OrderedDict
+
+import pygame
+
+_fonts = {}
+
+
+def get_font(name, size):
+    """Returns the shared Font for (name, size), creating it on first use."""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces bounded by entry count."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        """Returns the rendered surface for text, reusing a cached one if present."""
+        key = (font, text, tuple(color), antialias)
+        rendered = self._entries.get(key)
+        if rendered is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rendered
+
+        self.misses += 1
+        rendered = font.render(text, antialias, color)
+        self._entries[key] = rendered
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return rendered
+
+    def blit(self, surface, font, text, color, pos, center=False, antialias=True):
+        """Blits cached text at pos (topleft, or center) and returns its rect."""
+        rendered = self.render(font, text, color, antialias)
+        rect = rendered.get_rect()
+        if center:
+            rect.center = pos
+        else:
+            rect.topleft = pos
+        surface.blit(rendered, rect)
+        return rect
+
+    def blit_number(self, surface, font, prefix, value, suffix, color, pos, center=False, antialias=True):
+        """Blits prefix + value + suffix, building the number from digit glyphs."""
+        pieces = [self.render(font, prefix, color, antialias)] if prefix else []
+        for ch in str(value):
+            pieces.append(self.render(font, ch, color, antialias))
+        if suffix:
+            pieces.append(self.render(font, suffix, color, antialias))
+
+        width = sum(p.get_width() for p in pieces)
+        height = max((p.get_height() for p in pieces), default=0)
+        rect = pygame.Rect(0, 0, width, height)
+        if center:
+            rect.center = pos
+        else:
+            rect.topleft = pos
+
+        x = rect.x
+        for piece in pieces:
+            surface.blit(piece, (x, rect.y))
+            x += piece.get_width()
+        return rect
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """Returns hit/miss counters as a dict."""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by the whole process
+text_cache = TextCache()
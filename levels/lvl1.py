@@ -1,10 +1,28 @@
 import pygame
-import random
 import math
 import os
+import random
 import sys
 
-pygame.init()
+# Permite importar el paquete compartido 'engine' al ejecutar este archivo directamente
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.dirty_renderer import DirtyRenderer, dirty_rects_enabled
+from engine.flare import FlareEffect
+from engine.input import live_input
+from engine.loop import TICK_RATE, render_fps
+from engine.music import music
+from engine.particles import ParticleSystem
+from engine.plasma_store import HAS_NUMPY, PlasmaStore
+from engine.probe import null_probe
+from engine.quality import TIERS
+from engine.rng import stream
+from engine.scenes import Scene, SceneManager
+from engine.sfx import sfx
+from engine.spaceweather import load_schedule
+from engine.surface_cache import get_scaled
+from engine.telemetry import telemetry
+from engine.text_cache import get_font, text_cache
 
 SCREEN_WIDTH = 700
 SCREEN_HEIGHT = 900
@@ -12,49 +30,85 @@ SCREEN_HEIGHT = 900
 PLASMA_COLOR = (255, 50, 0)
 TEXT_COLOR = (255, 255, 255)
 
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Sun Dodge: The Solar Flare Protocol")
-clock = pygame.time.Clock()
-font_lg = pygame.font.Font(None, 74)
-font_md = pygame.font.Font(None, 48)
-font_sm = pygame.font.Font(None, 36)
-
-# Obtener la ruta base del script para cargar recursos
-script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-
-# Carga la imagen de fondo de forma segura con una ruta de carpeta
+# Modo "storm": sin el mínimo de 15 frames entre spawns (miles de plasmas en pantalla)
+STORM_MODE = os.environ.get("HELIOS_STORM", "0") == "1"
+MIN_SPAWN_RATE = 1 if STORM_MODE else 15
+
+# Curva de dificultad. La usan la escena y Lvl1Sim; engine.balance barre estos valores.
+DIFFICULTY = {
+    "interval": 600,         # Ticks entre subidas de dificultad (~10 s)
+    "speed_step": 0.8,       # Los plasmas caen más rápido
+    "spawn_step": 2,         # Aparecen más seguido
+    "base_spawn_rate": 60,   # Tasa base de spawn
+    "min_spawn_rate": MIN_SPAWN_RATE,  # Mínimo 15 frames entre spawns (1 en storm)
+    "plasma_speed": 5,
+    "charge_per_plasma": 6,
+    "flare_ratio": 0.9,      # Flare al 90% del tamaño máximo
+}
+# Almacén vectorizado con NumPy; se activa en modo storm o con HELIOS_PLASMA_STORE=numpy
+USE_PLASMA_STORE = HAS_NUMPY and (STORM_MODE or os.environ.get("HELIOS_PLASMA_STORE") == "numpy")
+
+RENDER_FPS = render_fps(60)  # 0 = sin límite; la simulación siempre va a TICK_RATE
+
+# Ajustes por nivel de calidad (engine.quality: 0 = alta ... 3 = mínima)
+QUALITY_FLARE_RINGS = (10, 7, 5, 3)
+QUALITY_SPAWN_CAP = (None, None, None, 30)  # Máximo de plasmas en pantalla
+# Escalado suave del sol e imágenes de plasma; se desactivan al bajar la calidad
+smooth_sun = True
+plasma_images = True
+
+# Obtener la ruta base del script para cargar recursos (también al importarlo)
+script_dir = os.path.dirname(os.path.abspath(__file__))
+images_dir = os.path.join(script_dir, 'assets', 'images')
+sounds_dir = os.path.join(os.path.dirname(script_dir), 'sound_effects')
+# Variantes del sonido al comer un plasma
+PICKUP_SOUNDS = [os.path.join(sounds_dir, f'fireball_{i}.mp3') for i in range(1, 5)]
+music_dir = os.path.join(os.path.dirname(script_dir), 'musica')
+# La música pasa a la pista movida a partir de este aumento de velocidad (~20 s)
+ACTION_SPEED_INCREASE = 1.6
+
+# Recursos del nivel; los carga Lvl1Scene.load() cuando ya existe la ventana
+font_lg = font_md = font_sm = None
 background_image = None
-try:
-    image_path = os.path.join(script_dir, 'assets', 'images', 'lvl1.png')
-    background_image = pygame.image.load(image_path).convert()
-except pygame.error as e:
-    print(f"Error al cargar la imagen de fondo: {e}")
-    print(f"Por favor, asegúrate de que la imagen 'lvl1.png' esté en la carpeta: {os.path.join(script_dir, 'assets', 'images')}")
-
-if background_image:
-    background_image = pygame.transform.scale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-
-# Carga la imagen del sol
 sun_image = None
 sun_original_size = None
-try:
-    sun_image_path = os.path.join(script_dir, 'assets', 'images', 'sun.png')
-    sun_image = pygame.image.load(sun_image_path).convert_alpha()
-    sun_original_size = sun_image.get_size()
-    print(f"Imagen del sol cargada correctamente - Tamaño original: {sun_original_size}")
-except pygame.error as e:
-    print(f"Error al cargar la imagen del sol: {e}")
-    print(f"Por favor, asegúrate de que la imagen 'sun.png' esté en la carpeta: {os.path.join(script_dir, 'assets', 'images')}")
-
-# Carga la imagen de plasma
 plasma_image = None
-try:
-    plasma_image_path = os.path.join(script_dir, 'assets', 'images', 'plasma_ball.png')
-    plasma_image = pygame.image.load(plasma_image_path).convert_alpha()
-    print("Imagen de plasma cargada correctamente")
-except pygame.error as e:
-    print(f"Error al cargar la imagen de plasma: {e}")
-    print(f"Por favor, asegúrate de que la imagen 'plasma_ball.png' esté en la carpeta: {os.path.join(script_dir, 'assets', 'images')}")
+
+
+def load_assets(scene):
+    """Carga imágenes y fuentes del nivel a través del registro compartido."""
+    global font_lg, font_md, font_sm, background_image, sun_image, sun_original_size, plasma_image
+    font_lg = get_font(None, 74)
+    font_md = get_font(None, 48)
+    font_sm = get_font(None, 36)
+
+    # Carga la imagen de fondo de forma segura con una ruta de carpeta
+    background_image = None
+    try:
+        background_image = scene.acquire_image(os.path.join(images_dir, 'lvl1.png'), (SCREEN_WIDTH, SCREEN_HEIGHT), alpha=False)
+    except pygame.error as e:
+        print(f"Error al cargar la imagen de fondo: {e}")
+        print(f"Por favor, asegúrate de que la imagen 'lvl1.png' esté en la carpeta: {images_dir}")
+
+    # Carga la imagen del sol
+    sun_image = None
+    sun_original_size = None
+    try:
+        sun_image = scene.acquire_image(os.path.join(images_dir, 'sun.png'))
+        sun_original_size = sun_image.get_size()
+        print(f"Imagen del sol cargada correctamente - Tamaño original: {sun_original_size}")
+    except pygame.error as e:
+        print(f"Error al cargar la imagen del sol: {e}")
+        print(f"Por favor, asegúrate de que la imagen 'sun.png' esté en la carpeta: {images_dir}")
+
+    # Carga la imagen de plasma
+    plasma_image = None
+    try:
+        plasma_image = scene.acquire_image(os.path.join(images_dir, 'plasma_ball.png'))
+        print("Imagen de plasma cargada correctamente")
+    except pygame.error as e:
+        print(f"Error al cargar la imagen de plasma: {e}")
+        print(f"Por favor, asegúrate de que la imagen 'plasma_ball.png' esté en la carpeta: {images_dir}")
 
 
 class Sun:
@@ -69,6 +123,9 @@ class Sun:
         self.current_scaled_image = None
         self.current_image_rect = None
         self.growth_rate = 2
+        self.prev_x = self.x
+        self._scaled_for_radius = None
+        self._scaled_size = None
 
     def move(self, direction):
         """Moves the sun left (-1) or right (1)."""
@@ -96,13 +153,19 @@ class Sun:
             
         current_radius = self.get_current_radius()
         
+        # Solo se vuelve a escalar cuando cambia el radio (la carga)
+        if (current_radius, smooth_sun) == self._scaled_for_radius:
+            return self.current_scaled_image, self._scaled_size
+        
         # Calcular el tamaño manteniendo la proporción
         scale_factor = (current_radius * 2) / max(sun_original_size)
         new_width = int(sun_original_size[0] * scale_factor)
         new_height = int(sun_original_size[1] * scale_factor)
         
-        scaled_image = pygame.transform.scale(sun_image, (new_width, new_height))
-        return scaled_image, (new_width, new_height)
+        scaled_image = get_scaled(sun_image, (new_width, new_height), smooth=smooth_sun)
+        self._scaled_for_radius = (current_radius, smooth_sun)
+        self._scaled_size = scaled_image.get_size()
+        return scaled_image, self._scaled_size
     
     def get_collision_rect(self):
         """Devuelve el rectángulo de colisión actual del sol."""
@@ -113,55 +176,89 @@ class Sun:
             return pygame.Rect(self.x - current_radius, self.y - current_radius, 
                              current_radius * 2, current_radius * 2)
         
-    def draw(self, surface):
+    def interpolated_x(self, alpha=1.0):
+        """Posición x entre el tick anterior y el actual, para dibujar."""
+        return self.prev_x + (self.x - self.prev_x) * alpha
+
+    def draw(self, surface, alpha=1.0):
         current_radius = self.get_current_radius()
+        x = self.interpolated_x(alpha)
         
         if sun_image:
             self.current_scaled_image, new_size = self.get_scaled_image()
             if self.current_scaled_image:
-                self.current_image_rect = self.current_scaled_image.get_rect(center=(self.x, self.y))
+                self.current_image_rect = self.current_scaled_image.get_rect(center=(x, self.y))
                 surface.blit(self.current_scaled_image, self.current_image_rect)
             else:
-                self.draw_fallback(surface, current_radius)
+                self.draw_fallback(surface, current_radius, center=(int(x), int(self.y)))
                 self.current_image_rect = None
         else:
-            self.draw_fallback(surface, current_radius)
+            self.draw_fallback(surface, current_radius, center=(int(x), int(self.y)))
             self.current_image_rect = None
     
-    def draw_fallback(self, surface, current_radius):
-        """Dibuja un círculo como respaldo cuando no hay imagen."""
+    def fallback_color(self):
+        """Color del círculo de respaldo según la carga."""
         if self.charge < 10:
-            color = (255, 255, 150)
+            return (255, 255, 150)
         elif self.charge < 20:
-            color = (255, 200, 0)
+            return (255, 200, 0)
         elif self.charge < 30:
-            color = (255, 150, 0)
+            return (255, 150, 0)
         else:
-            color = (255, 100, 0)
+            return (255, 100, 0)
+
+    def draw_fallback(self, surface, current_radius, center=None):
+        """Dibuja un círculo como respaldo cuando no hay imagen."""
+        color = self.fallback_color()
+        if center is None:
+            center = (int(self.x), int(self.y))
             
-        pygame.draw.circle(surface, color, (int(self.x), int(self.y)), int(current_radius))
+        pygame.draw.circle(surface, color, center, int(current_radius))
         
         r, g, b = color
         glow_color = (max(0, r-50), max(0, g-50), max(0, b-50))
-        pygame.draw.circle(surface, glow_color, (int(self.x), int(self.y)), int(current_radius), 5)
+        pygame.draw.circle(surface, glow_color, center, int(current_radius), 5)
+
+
+# Generador propio de los plasmas (semilla fija en grabaciones y benchmarks)
+plasma_rng = stream("lvl1.plasma")
+
+def random_plasma_params(base_speed=3, speed_increase=0, rng=plasma_rng):
+    """Devuelve (x, y, speed, radius) aleatorios para un plasma nuevo."""
+    radius = rng.randint(20, 35)
+    x = rng.randint(0, SCREEN_WIDTH)
+    # Velocidad base + aumento progresivo
+    speed = rng.uniform(base_speed, base_speed + 2) + speed_increase
+    return x, -radius, speed, radius
+
+
+def plasma_image_for_radius(radius):
+    """Imagen de plasma escalada (compartida) para un radio, o None."""
+    if not plasma_image:
+        return None
+    return get_scaled(plasma_image, (radius * 2, radius * 2))
+
+
+def draw_plasma_circle(surface, center, radius):
+    """Dibuja un plasma como círculo cuando no hay imagen."""
+    pygame.draw.circle(surface, PLASMA_COLOR, center, radius)
+    # Efecto de brillo interno
+    inner_color = (255, 100, 50)
+    pygame.draw.circle(surface, inner_color, center, radius - 5)
 
 
 class Plasma:
     """Represents falling plasma that makes the sun grow."""
     def __init__(self, base_speed=3, speed_increase=0):
-        self.radius = random.randint(20, 35)
-        self.x = random.randint(0, SCREEN_WIDTH)
-        self.y = -self.radius
-        # Velocidad base + aumento progresivo
-        self.speed = random.uniform(base_speed, base_speed + 2) + speed_increase
+        self.x, self.y, self.speed, self.radius = random_plasma_params(base_speed, speed_increase)
         self.color = PLASMA_COLOR
         self.image = plasma_image
         self.scaled_image = None
         self.image_rect = None
+        self.sprite = None  # PlasmaSprite en modo dirty rects
         
         if self.image:
-            size = self.radius * 2 
-            self.scaled_image = pygame.transform.scale(self.image, (size, size))
+            self.scaled_image = plasma_image_for_radius(self.radius)
             self.image_rect = self.scaled_image.get_rect(center=(int(self.x), int(self.y)))
 
     def update(self):
@@ -170,15 +267,78 @@ class Plasma:
         if self.image_rect:
             self.image_rect.center = (int(self.x), int(self.y))
 
-    def draw(self, surface):
+    def interpolated_y(self, alpha=1.0):
+        """Posición y entre el tick anterior y el actual, para dibujar."""
+        return self.y - self.speed * (1.0 - alpha)
+
+    def draw(self, surface, alpha=1.0):
         """Draws the plasma as an image or a circle if image not loaded."""
-        if self.scaled_image and self.image_rect:
+        center = (int(self.x), int(self.interpolated_y(alpha)))
+        if self.scaled_image and self.image_rect and plasma_images:
+            self.image_rect.center = center
             surface.blit(self.scaled_image, self.image_rect)
         else:
-            pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), self.radius)
-            # Efecto de brillo interno
-            inner_color = (255, 100, 50)
-            pygame.draw.circle(surface, inner_color, (int(self.x), int(self.y)), self.radius - 5)
+            self.draw_fallback(surface, center)
+
+    def draw_fallback(self, surface, center):
+        draw_plasma_circle(surface, center, self.radius)
+
+    def kill_sprite(self):
+        """Quita el sprite asociado del grupo de dibujo, si existe."""
+        if self.sprite:
+            self.sprite.kill()
+            self.sprite = None
+
+
+# --- Modo dirty rects: vistas de sprite para Plasma y Sun ---
+_plasma_fallback_surfaces = {}
+
+
+class PlasmaSprite(pygame.sprite.DirtySprite):
+    """Sprite que sigue la posición de un Plasma."""
+    def __init__(self, plasma):
+        super().__init__()
+        self.plasma = plasma
+        plasma.sprite = self
+        self.dirty = 2  # Se mueve en cada frame
+        if plasma.scaled_image:
+            self.image = plasma.scaled_image
+        else:
+            self.image = _plasma_fallback_surfaces.get(plasma.radius)
+            if self.image is None:
+                self.image = pygame.Surface((plasma.radius * 2, plasma.radius * 2), pygame.SRCALPHA)
+                plasma.draw_fallback(self.image, (plasma.radius, plasma.radius))
+                _plasma_fallback_surfaces[plasma.radius] = self.image
+        self.rect = self.image.get_rect(center=(int(plasma.x), int(plasma.y)))
+
+    def update(self, alpha=1.0):
+        self.rect.center = (int(self.plasma.x), int(self.plasma.interpolated_y(alpha)))
+
+
+class SunSprite(pygame.sprite.DirtySprite):
+    """Sprite que sigue al Sun y cambia de imagen cuando crece."""
+    def __init__(self, sun):
+        super().__init__()
+        self.sun = sun
+        self.dirty = 2
+        self._fallback_key = None
+        self.update()
+
+    def update(self, alpha=1.0):
+        sun = self.sun
+        image, _ = sun.get_scaled_image()
+        if image is None:
+            radius = int(sun.get_current_radius())
+            key = (radius, sun.fallback_color())
+            if key != self._fallback_key:
+                self._fallback_key = key
+                self._fallback_image = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+                sun.draw_fallback(self._fallback_image, radius, center=(radius, radius))
+            image = self._fallback_image
+        sun.current_scaled_image = image
+        self.image = image
+        self.rect = image.get_rect(center=(int(sun.interpolated_x(alpha)), int(sun.y)))
+        sun.current_image_rect = self.rect
 
 
 def check_collision(sun, plasma):
@@ -188,170 +348,489 @@ def check_collision(sun, plasma):
     return distance < (sun_current_radius + plasma.radius)
 
 
+def flare_reached(sun, rules=DIFFICULTY):
+    """True cuando el sol ha crecido lo bastante para liberar el flare."""
+    max_possible_radius = min(SCREEN_WIDTH, SCREEN_HEIGHT) // 2
+    return sun.get_current_radius() >= max_possible_radius * rules["flare_ratio"]
+
+
 def draw_text(surface, text, font, color, x, y, center=False):
     """Utility function to draw text."""
-    text_surface = font.render(text, True, color)
-    rect = text_surface.get_rect()
-    if center:
-        rect.center = (x, y)
-    else:
-        rect.topleft = (x, y)
-    surface.blit(text_surface, rect)
-
-
-def solar_flare_animation(surface, sun):
-    max_radius = int(SCREEN_WIDTH * 1.5)
-    for i in range(10):
-        radius = int(max_radius * (i / 10))
-        alpha = 255 - int(255 * (i / 10))
+    return text_cache.blit(surface, font, text, color, (x, y), center=center)
+
+
+def draw_counter(surface, prefix, value, suffix, font, color, x, y, center=False):
+    """Dibuja un contador componiendo dígitos ya renderizados."""
+    return text_cache.blit_number(surface, font, prefix, value, suffix, color, (x, y), center=center)
+
+
+# Animación del solar flare precalculada (una sola superficie reutilizada)
+flare_effect = FlareEffect((SCREEN_WIDTH, SCREEN_HEIGHT), color=(255, 100, 0),
+                           ring_count=10, max_radius=int(SCREEN_WIDTH * 1.5))
+
+
+def solar_flare_animation(surface, sun, now=None):
+    """Dibuja el solar flare centrado en el sol y devuelve el área modificada."""
+    center = (int(sun.x), int(sun.y))
+    if flare_effect.center != center:
+        flare_effect.start(center, flare_effect.start_time)
+    # Sin 'now' se dibujan todos los anillos, como la animación original
+    return flare_effect.draw(surface, now)
+
+
+# Efectos de partículas (aditivos; sin NumPy no dibujan nada)
+CME_PALETTE = [(255, 120, 20), (255, 200, 60), (255, 60, 10)]
+TRAIL_PALETTE = [(255, 110, 20), (255, 170, 60)]
+CME_BURST = 2500
+# Aviso en el HUD cuando el calendario de clima espacial trae un flare de rayos X
+XRAY_ALERT_TICKS = 120
+# La pantalla final vuelve sola al siguiente nivel tras este tiempo
+END_SCREEN_MS = 5000
+
+
+def plasma_positions(plasmas):
+    """Arrays (o listas) con la posición de la cola de cada plasma."""
+    if USE_PLASMA_STORE:
+        n = plasmas.count
+        return plasmas.x[:n], plasmas.y[:n] - plasmas.radius[:n]
+    return [p.x for p in plasmas], [p.y - p.radius for p in plasmas]
+
+
+def new_plasma_container():
+    """Lista de Plasma, o un PlasmaStore vectorizado si está activado."""
+    if USE_PLASMA_STORE:
+        return PlasmaStore(
+            image_for_radius=lambda radius: plasma_image_for_radius(radius) if plasma_images else None,
+            draw_fallback=lambda surface, x, y, radius: draw_plasma_circle(surface, (x, y), radius),
+        )
+    return []
+
+
+class Lvl1Scene(Scene):
+    """Nivel 1: el sol come plasmas hasta liberar un solar flare."""
+    size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    caption = "Sun Dodge: The Solar Flare Protocol"
+
+    def preload(self, preloader):
+        # Mismas claves que load_assets(), para que el registro las reutilice
+        preloader.add_image(os.path.join(images_dir, 'lvl1.png'), (SCREEN_WIDTH, SCREEN_HEIGHT), alpha=False)
+        preloader.add_image(os.path.join(images_dir, 'sun.png'))
+        preloader.add_image(os.path.join(images_dir, 'plasma_ball.png'))
+        for path in PICKUP_SOUNDS:
+            preloader.add_sound(path)
+        # La pista de acción arranca con su primer fragmento ya decodificado
+        preloader.add_music("action", os.path.join(music_dir, 'movida_1_zelda.mp3'))
+
+    def load(self):
+        load_assets(self)
+        self.define_sound("pickup", PICKUP_SOUNDS, priority=1, volume=0.5)
+        music.add_track("calm", os.path.join(music_dir, 'Calmada_1_zelda.mp3'))
+        music.add_track("action", os.path.join(music_dir, 'movida_1_zelda.mp3'))
+        # Plasmas a partir de datos reales (HELIOS_SPACE_WEATHER); se prepara aquí, nunca en el bucle
+        try:
+            self.schedule = load_schedule(tick_rate=TICK_RATE)
+        except (OSError, ValueError) as e:
+            print(f"Clima espacial desactivado: {e}")
+            self.schedule = None
+
+    def unload(self):
+        super().unload()
+        if self.schedule is not None:
+            self.schedule.close()
+            self.schedule = None
+
+    def enter(self):
+        self.rules = DIFFICULTY
+        self.base_spawn_rate = self.rules["base_spawn_rate"]
+        self.flare_duration = 3000  # Reducido a 3 segundos
+        flare_effect.bake()
+        # Eyección de masa coronal al liberar el flare y estela de los plasmas.
+        # En modo storm hay miles de estelas: se dibujan como puntos con surfarray.
+        self.cme = ParticleSystem(CME_PALETTE, capacity=8192, radius=4, drag=0.985, name="lvl1.cme")
+        self.trails = ParticleSystem(TRAIL_PALETTE, capacity=32768, radius=2,
+                                     mode="points" if STORM_MODE else "sprites", name="lvl1.trails")
+        self.reset()
+
+    def reset(self):
+        """Estado de una partida nueva (al entrar y al pulsar SPACE)."""
+        self.player_sun = Sun()
+        self.plasmas = new_plasma_container()
         
-        temp_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        color = (255, 100, 0, alpha) 
-        pygame.draw.circle(temp_surface, color, (sun.x, sun.y), radius)
-        surface.blit(temp_surface, (0, 0))
-
-
-def game_loop():
-    running = True
-    
-    player_sun = Sun()
-    plasmas = []
-    
-    spawn_time = 0
-    base_spawn_rate = 60  # Tasa base de spawn
-    current_spawn_rate = base_spawn_rate
-    
-    # Variables para aumentar dificultad
-    game_time = 0
-    speed_increase = 0
-    spawn_acceleration = 0
-    
-    flare_cycles = 0
-    
-    game_over = False
-    game_over_start_time = 0
-    flare_duration = 3000  # Reducido a 3 segundos
-    
-    start_time = pygame.time.get_ticks() 
-    elapsed_time = 0
-    end_game_time = 0
-    
-    solar_flare_occurred = False  # Nueva variable para controlar el solar flare
-    
-    while running:
+        self.spawn_time = 0
+        self.current_spawn_rate = self.base_spawn_rate
+        self.xray_alert_until = 0
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            
-            if game_over and event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                player_sun = Sun()
-                plasmas = []
-                game_over = False
-                game_over_start_time = 0
-                flare_cycles = 0 
-                start_time = pygame.time.get_ticks()
-                end_game_time = 0
-                # Resetear variables de dificultad
-                current_spawn_rate = base_spawn_rate
-                speed_increase = 0
-                spawn_acceleration = 0
-                game_time = 0
-                solar_flare_occurred = False
-                
-        keys = pygame.key.get_pressed()
+        # Variables para aumentar dificultad
+        self.game_time = 0
+        self.speed_increase = 0
+        self.spawn_acceleration = 0
         
-        if not game_over and not solar_flare_occurred:  # Solo actualizar si no hay solar flare
-            game_time += 1
-            
-            # Aumentar dificultad con el tiempo
-            if game_time % 600 == 0:  # Cada 10 segundos aproximadamente
-                speed_increase += 0.8  # Los plasmas caen más rápido
-                spawn_acceleration += 2  # Aparecen más seguido
-                current_spawn_rate = max(15, base_spawn_rate - spawn_acceleration)  # Mínimo 15 frames entre spawns
-                print(f"Dificultad aumentada! Velocidad: +{speed_increase}, Spawn rate: {current_spawn_rate}")
-            
-            if keys[pygame.K_LEFT]:
-                player_sun.move(-1)
-            if keys[pygame.K_RIGHT]:
-                player_sun.move(1)
-
-            # Spawn de plasmas (solo plasmas)
-            spawn_time += 4
-            if spawn_time >= current_spawn_rate:
-                plasmas.append(Plasma(base_speed=5, speed_increase=speed_increase))
-                spawn_time = 0
-
-            # Actualizar y verificar colisiones con plasmas
+        self.flare_cycles = 0
+        
+        self.game_over = False
+        self.game_over_start_time = 0
+        
+        # Los tiempos de juego se miden en tiempo simulado, no en tiempo real
+        self.start_time = self.app.sim.now_ms()
+        self.elapsed_time = 0
+        self.end_game_time = 0
+        
+        self.solar_flare_occurred = False  # Nueva variable para controlar el solar flare
+        self.cme.clear()
+        self.trails.clear()
+
+        # Modo opcional de dirty rects (HELIOS_DIRTY_RECTS=1); no aplica al PlasmaStore
+        self.renderer = None
+        self.sprites = pygame.sprite.LayeredDirty()
+        if dirty_rects_enabled() and not USE_PLASMA_STORE:
+            self.renderer = DirtyRenderer(self.app.screen, background_image, self.sprites, enabled=True)
+            if not background_image:
+                self.renderer.background.fill((0, 0, 20))
+            self.sprites.add(SunSprite(self.player_sun), layer=1)
+
+    def set_quality(self, tier):
+        """Menos anillos de flare, escalado rápido, círculos y tope de plasmas al bajar la calidad."""
+        global smooth_sun, plasma_images
+        super().set_quality(tier)
+        flare_effect.set_ring_count(QUALITY_FLARE_RINGS[tier])
+        smooth_sun = tier == 0
+        plasma_images = tier < 2
+        self.trails_enabled = tier < 2
+        self.spawn_cap = QUALITY_SPAWN_CAP[tier]
+
+    def absorb_plasma(self):
+        """Crecimiento del sol al comer un plasma y disparo del solar flare."""
+        player_sun = self.player_sun
+        # COLISIÓN CON PLASMA = CRECIMIENTO
+        player_sun.charge += self.rules["charge_per_plasma"]
+        sfx.play("pickup")
+        
+        # CORREGIDO: Condición para solar flare
+        if flare_reached(player_sun, self.rules):
+            self.flare_cycles += 1
+            player_sun.charge = 0
+            self.solar_flare_occurred = True  # Activar solar flare
+            self.game_over_start_time = self.app.sim.now_ms()  # Iniciar temporizador
+            player_sun.is_flaring = True
+            flare_effect.start((player_sun.x, player_sun.y), self.game_over_start_time)
+            self.cme.emit(player_sun.x, player_sun.y, count=CME_BURST, speed=(2, 12), life=(40, 110), kind=(0, 2))
+            print(f"¡SOLAR FLARE! Ciclos completados: {self.flare_cycles}")
+            telemetry.event("flare", self.flare_cycles, self.game_time / TICK_RATE)
+
+    def spawn_plasma(self, speed_increase):
+        """Añade un plasma; False si el tope de calidad no lo permite."""
+        plasmas = self.plasmas
+        if self.spawn_cap is not None and len(plasmas) >= self.spawn_cap:
+            return False
+        base_speed = self.rules["plasma_speed"]
+        if USE_PLASMA_STORE:
+            plasmas.spawn(*random_plasma_params(base_speed=base_speed, speed_increase=speed_increase))
+            return True
+        new_plasma = Plasma(base_speed=base_speed, speed_increase=speed_increase)
+        plasmas.append(new_plasma)
+        if self.renderer:
+            self.sprites.add(PlasmaSprite(new_plasma), layer=0)
+        return True
+
+    def handle_event(self, event):
+        if self.game_over and event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            telemetry.event("restart", self.flare_cycles)
+            self.reset()
+
+    def update(self, keys):
+        """Un tick de simulación."""
+        now = self.app.sim.now_ms()
+        # Música tranquila al principio, movida con la dificultad o el flare
+        music.play("action" if self.solar_flare_occurred or self.speed_increase >= ACTION_SPEED_INCREASE else "calm")
+        self.cme.update()
+        self.trails.update()
+        if self.solar_flare_occurred:
+            # La eyección sigue saliendo del sol mientras dura la animación
+            if not self.game_over:
+                sun = self.player_sun
+                self.cme.emit(sun.x, sun.y, count=40, speed=(4, 10), life=(30, 80), kind=(0, 2))
+            # Animación del solar flare y luego game over
+            if now - self.game_over_start_time >= self.flare_duration:
+                self.game_over = True
+                if self.end_game_time == 0:
+                    self.end_game_time = now
+                if now - self.end_game_time > END_SCREEN_MS:
+                    self.finish()
+            return
+
+        probe = self.app.probe
+        player_sun = self.player_sun
+        plasmas = self.plasmas
+        self.game_time += 1
+        player_sun.prev_x = player_sun.x
+    
+        # Aumentar dificultad con el tiempo
+        rules = self.rules
+        if self.game_time % rules["interval"] == 0:
+            self.speed_increase += rules["speed_step"]
+            self.spawn_acceleration += rules["spawn_step"]
+            self.current_spawn_rate = max(rules["min_spawn_rate"], self.base_spawn_rate - self.spawn_acceleration)
+            print(f"Dificultad aumentada! Velocidad: +{self.speed_increase}, Spawn rate: {self.current_spawn_rate}")
+            telemetry.event("difficulty", self.current_spawn_rate, self.speed_increase)
+    
+        if keys[pygame.K_LEFT]:
+            player_sun.move(-1)
+        if keys[pygame.K_RIGHT]:
+            player_sun.move(1)
+
+        # Spawn de plasmas: del calendario de clima espacial si lo hay, si no por temporizador
+        if self.schedule is not None:
+            count, speed_bonus, xray_flare = self.schedule.at(self.game_time)
+            for _ in range(count):
+                if not self.spawn_plasma(self.speed_increase + speed_bonus):
+                    break
+            if xray_flare:
+                self.xray_alert_until = self.game_time + XRAY_ALERT_TICKS
+        else:
+            self.spawn_time += 4
+            if self.spawn_time >= self.current_spawn_rate:
+                # En modo storm se generan todos los plasmas acumulados en el frame
+                for _ in range(self.spawn_time // self.current_spawn_rate if STORM_MODE else 1):
+                    if not self.spawn_plasma(self.speed_increase):
+                        break
+                self.spawn_time = 0
+
+        probe.lap("update")
+
+        # Actualizar y verificar colisiones con plasmas
+        if USE_PLASMA_STORE:
+            # Movimiento, colisión y limpieza en pasadas vectorizadas.
+            # El radio del sol se toma al inicio del tick.
+            plasmas.update()
+            probe.lap("update")
+            hits = plasmas.collide_circle(player_sun.x, player_sun.y, player_sun.get_current_radius())
+            plasmas.remove(hits)
+            for _ in range(len(hits)):
+                self.absorb_plasma()
+            plasmas.remove(plasmas.offscreen(SCREEN_HEIGHT))
+        else:
             for plasma in list(plasmas): 
                 plasma.update()
-                
+            
                 if check_collision(player_sun, plasma):
-                    # COLISIÓN CON PLASMA = CRECIMIENTO
-                    player_sun.charge += 6
                     plasmas.remove(plasma)
+                    plasma.kill_sprite()
+                    self.absorb_plasma()
                     
-                    current_radius = player_sun.get_current_radius()
-                    max_possible_radius = min(SCREEN_WIDTH, SCREEN_HEIGHT) // 2
-                    
-                    # CORREGIDO: Condición para solar flare
-                    if current_radius >= max_possible_radius * 0.9:  # 90% del tamaño máximo
-                        flare_cycles += 1
-                        player_sun.charge = 0
-                        solar_flare_occurred = True  # Activar solar flare
-                        game_over_start_time = pygame.time.get_ticks()  # Iniciar temporizador
-                        player_sun.is_flaring = True
-                        print(f"¡SOLAR FLARE! Ciclos completados: {flare_cycles}")
-                        
                 elif plasma.y > SCREEN_HEIGHT + plasma.radius:
                     plasmas.remove(plasma)
-
-            # Dibujar
-            if background_image:
-                screen.blit(background_image, (0, 0))
+                    plasma.kill_sprite()
+        # En la ruta por objeto movimiento y colisión van juntos
+        probe.lap("collide")
+
+        # Estela: una partícula por plasma y tick, subiendo despacio
+        if self.trails_enabled and len(plasmas):
+            xs, ys = plasma_positions(plasmas)
+            self.trails.emit(xs, ys, speed=(0.1, 0.6), angle=(-math.pi, 0), life=(10, 22), kind=(0, 1))
+
+        self.elapsed_time = (self.app.sim.now_ms() - self.start_time) // 1000
+
+    def draw(self, screen, alpha):
+        """Dibuja (interpolando entre el tick anterior y el actual)."""
+        renderer = self.renderer
+        if not self.solar_flare_occurred:
+            if renderer:
+                renderer.begin()
+                self.sprites.update(alpha)
+                renderer.draw_sprites()
+                renderer.mark(self.trails.draw(screen))
             else:
-                screen.fill((0, 0, 20)) 
-
-            elapsed_time = (pygame.time.get_ticks() - start_time) // 1000
-            
-            # Información en pantalla
-            draw_text(screen, f"Time: {elapsed_time}s", font_sm, TEXT_COLOR, 10, 50)
-            draw_text(screen, f"Plasmas: {player_sun.charge}", font_sm, TEXT_COLOR, 10, 110)
+                if background_image:
+                    screen.blit(background_image, (0, 0))
+                else:
+                    screen.fill((0, 0, 20)) 
 
-            for plasma in plasmas:
-                plasma.draw(screen)
+                self.trails.draw(screen)
+                if USE_PLASMA_STORE:
+                    self.plasmas.draw(screen, alpha)
+                else:
+                    for plasma in self.plasmas:
+                        plasma.draw(screen, alpha)
 
-            player_sun.draw(screen)
-
-            draw_text(screen, "Eat the plasmas to grow!", font_sm, TEXT_COLOR, SCREEN_WIDTH // 2, 10, center=True)
-
-        # Mostrar animación de solar flare y luego game over
-        if solar_flare_occurred:
-            time_elapsed_since_flare = pygame.time.get_ticks() - game_over_start_time
-            
-            if time_elapsed_since_flare < flare_duration:
-                # Mostrar animación de solar flare
-                solar_flare_animation(screen, player_sun)
-                draw_text(screen, "SOLAR FLARE RELEASE!", font_lg, (255, 0, 0), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50, center=True)
-                draw_text(screen, "The sun has grown too large!", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50, center=True)
-            else:
-                # Después de la animación, mostrar pantalla de game over
-                game_over = True
-                screen.fill((50, 0, 0)) 
-                draw_text(screen, "SOLAR FLARE COMPLETE", font_lg, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100, center=True)
-                draw_text(screen, f"Flares Released: {flare_cycles}", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20, center=True)
-                draw_text(screen, f"Time Survived: {elapsed_time}s", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20, center=True)
-                draw_text(screen, "Press SPACE to Restart", font_sm, (150, 150, 150), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 80, center=True)
-                
-                if end_game_time == 0:
-                    end_game_time = pygame.time.get_ticks()
-                if pygame.time.get_ticks() - end_game_time > 5000:
-                    running = False
-
-        pygame.display.flip()
-        clock.tick(60)
+                self.player_sun.draw(screen, alpha)
 
+            # Información en pantalla
+            hud_rects = [
+                draw_counter(screen, "Time: ", self.elapsed_time, "s", font_sm, TEXT_COLOR, 10, 50),
+                draw_counter(screen, "Plasmas: ", self.player_sun.charge, "", font_sm, TEXT_COLOR, 10, 110),
+                draw_text(screen, "Eat the plasmas to grow!", font_sm, TEXT_COLOR, SCREEN_WIDTH // 2, 10, center=True),
+            ]
+            if self.game_time < self.xray_alert_until:
+                hud_rects.append(draw_text(screen, "X-ray flare!", font_sm, (255, 90, 90), SCREEN_WIDTH - 180, 50))
+            if self.quality:
+                hud_rects.append(draw_text(screen, f"Quality: {TIERS[self.quality]}", font_sm, (150, 150, 150), 10, 140))
+            if renderer:
+                for rect in hud_rects:
+                    renderer.mark(rect)
+
+        elif not self.game_over:
+            # Mostrar animación de solar flare
+            solar_flare_animation(screen, self.player_sun, now=self.app.sim.now_ms())
+            self.cme.draw(screen)
+            draw_text(screen, "SOLAR FLARE RELEASE!", font_lg, (255, 0, 0), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50, center=True)
+            draw_text(screen, "The sun has grown too large!", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50, center=True)
+        else:
+            # Después de la animación, mostrar pantalla de game over
+            screen.fill((50, 0, 0)) 
+            draw_text(screen, "SOLAR FLARE COMPLETE", font_lg, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100, center=True)
+            draw_text(screen, f"Flares Released: {self.flare_cycles}", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20, center=True)
+            draw_text(screen, f"Time Survived: {self.elapsed_time}s", font_md, (255, 255, 255), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 20, center=True)
+            draw_text(screen, "Press SPACE to Restart", font_sm, (150, 150, 150), SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 80, center=True)
+
+    def idle_timeout(self):
+        # La pantalla final no se mueve: se espera al SPACE o a la salida automática
+        if not self.game_over or not self.end_game_time:
+            return None
+        left = END_SCREEN_MS - (self.app.sim.now_ms() - self.end_game_time)
+        return max(1, left + 1000 // TICK_RATE)
+
+    def state_digest(self):
+        sun = self.player_sun
+        return (sun.x, sun.charge, len(self.plasmas), self.spawn_time, self.game_time,
+                self.flare_cycles, self.solar_flare_occurred, self.game_over)
+
+    def invalidate(self):
+        if self.renderer:
+            self.renderer.invalidate()
+
+    def present(self):
+        # El flare y la pantalla final cubren todo: siempre flip completo
+        if self.renderer and self.solar_flare_occurred:
+            self.renderer.present_full()
+        elif self.renderer:
+            self.renderer.present()
+        else:
+            pygame.display.flip()
+
+    def count_objects(self, probe):
+        probe.count("plasmas", len(self.plasmas))
+        probe.count("effects", len(self.cme) + len(self.trails))
+
+
+# --- Simulación sin ventana para barridos de balance (engine.balance) ---
+class SimPlasma:
+    """Plasma sin imagen: solo lo que usan las reglas."""
+    __slots__ = ("x", "y", "speed", "radius")
+
+    def __init__(self, x, y, speed, radius):
+        self.x, self.y, self.speed, self.radius = x, y, speed, radius
+
+
+class Lvl1Sim:
+    """Las reglas de Lvl1Scene.update() sin dibujo, sonido ni escena.
+
+    Un bot (policy) decide cada tick si el sol va a la izquierda (-1), a la
+    derecha (1) o se queda quieto (0). run() juega una partida hasta el
+    flare o max_ticks y devuelve sus métricas.
+    """
+
+    def __init__(self, seed, rules=None):
+        self.rules = {**DIFFICULTY, **(rules or {})}
+        self.rng = random.Random(f"{seed}:plasma")
+        self.policy_rng = random.Random(f"{seed}:policy")
+        self.sun = Sun()
+        self.plasmas = []
+        self.game_time = 0
+        self.spawn_time = 0
+        self.speed_increase = 0
+        self.spawn_acceleration = 0
+        self.current_spawn_rate = self.rules["base_spawn_rate"]
+        self.flared = False
+        self.eaten = 0
+        self.missed = 0
+        self.peak_plasmas = 0
+
+    def step(self, direction):
+        """Un tick, en el mismo orden que la escena."""
+        rules = self.rules
+        sun = self.sun
+        plasmas = self.plasmas
+        self.game_time += 1
+        if self.game_time % rules["interval"] == 0:
+            self.speed_increase += rules["speed_step"]
+            self.spawn_acceleration += rules["spawn_step"]
+            self.current_spawn_rate = max(rules["min_spawn_rate"], rules["base_spawn_rate"] - self.spawn_acceleration)
+        if direction:
+            sun.move(direction)
+
+        self.spawn_time += 4
+        if self.spawn_time >= self.current_spawn_rate:
+            for _ in range(self.spawn_time // self.current_spawn_rate if STORM_MODE else 1):
+                plasmas.append(SimPlasma(*random_plasma_params(rules["plasma_speed"], self.speed_increase, self.rng)))
+            self.spawn_time = 0
+
+        for plasma in list(plasmas):
+            plasma.y += plasma.speed
+            if check_collision(sun, plasma):
+                plasmas.remove(plasma)
+                self.eaten += 1
+                sun.charge += rules["charge_per_plasma"]
+                if flare_reached(sun, rules):
+                    self.flared = True
+                    return
+            elif plasma.y > SCREEN_HEIGHT + plasma.radius:
+                plasmas.remove(plasma)
+                self.missed += 1
+        self.peak_plasmas = max(self.peak_plasmas, len(plasmas))
+
+    def run(self, policy, max_ticks):
+        while not self.flared and self.game_time < max_ticks:
+            self.step(policy(self))
+        return {
+            "survival_s": self.game_time / TICK_RATE,
+            "flared": int(self.flared),
+            "eaten": self.eaten,
+            "missed": self.missed,
+            "peak_plasmas": self.peak_plasmas,
+        }
+
+
+def idle_policy():
+    return lambda sim: 0
+
+
+def random_policy():
+    """Tramos de 10-60 ticks a la izquierda, a la derecha o quieto, como engine.bench."""
+    state = {"left": 0, "direction": 0}
+
+    def policy(sim):
+        if state["left"] <= 0:
+            state["direction"] = sim.policy_rng.choice((-1, 0, 1))
+            state["left"] = sim.policy_rng.randint(10, 60)
+        state["left"] -= 1
+        return state["direction"]
+    return policy
+
+
+def greedy_policy():
+    """Persigue el plasma más bajo que todavía está por encima del sol."""
+    def policy(sim):
+        sun = sim.sun
+        target = None
+        for plasma in sim.plasmas:
+            if plasma.y < sun.y and (target is None or plasma.y > target.y):
+                target = plasma
+        if target is None or abs(target.x - sun.x) < sun.base_speed:
+            return 0
+        return 1 if target.x > sun.x else -1
+    return policy
+
+
+SIM_POLICIES = {"idle": idle_policy, "random": random_policy, "greedy": greedy_policy}
+
+
+def game_loop(input_source=live_input, max_frames=None, probe=null_probe, sim=None, fps=None):
+    """Ejecuta solo este nivel. Los parámetros permiten ejecutarlo sin teclado (benchmarks)."""
+    manager = SceneManager(input_source=input_source, probe=probe, sim=sim,
+                           fps=RENDER_FPS if fps is None else fps)
+    manager.run(Lvl1Scene(), max_frames=max_frames)
     pygame.quit()
+
     
 if __name__ == '__main__':
-    game_loop()
\ No newline at end of file
+    game_loop()
@@ -1,30 +1,71 @@
+import argparse
+import os
 import pygame
 import sys
 
+from engine.input import live_input
+from engine.loop import TICK_RATE, FixedStepLoop
+from engine.music import music
+from engine.preload import Preloader
+from engine.replay import Recorder
+from engine.rng import streams
+from engine.scenes import Scene, SceneManager
+from engine.text_cache import get_font, text_cache
+from levels import lvl1
+from levels.lvl3 import lvl3
+
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MUSIC_PATH = os.path.join(ROOT_DIR, "musica", "Calmada_1_zelda.mp3")
+BACKGROUND_PATH = 'levels/assets/images/helioss.jpg'
+
+
+class IntroScene(Scene):
+    """Title screen; decodes the levels' assets in the background until Start is clicked."""
+    size = (800, 600)
+    caption = "HELIOS: The Space Weather Game"
+
+    def preload(self, preloader):
+        preloader.add_image(BACKGROUND_PATH, self.size, alpha=False)
+
+    def load(self):
+        try:
+            self.background_image = self.acquire_image(BACKGROUND_PATH, self.size, alpha=False)
+        except pygame.error as e:
+            self.background_image = None
+
+    def enter(self):
+        self.start_button_rect = pygame.Rect(0, 0, 0, 0)
+        self.preloader = Preloader()
+        for name, scene in self.app.scenes.items():
+            if scene is not self:
+                scene.preload(self.preloader)
+        # Streamed like the levels' music; lvl1 opens on the same track, so it keeps playing
+        music.add_track("calm", MUSIC_PATH)
+        music.play("calm")
+
+    def exit(self):
+        self.preloader.cancel()
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and self.start_button_rect.collidepoint(event.pos):
+            # Whatever is still decoding is finished now, so the level starts ready
+            self.preloader.finish()
+            self.finish()
+
+    def update(self, keys):
+        self.preloader.pump()
+
+    def idle_timeout(self):
+        # Nothing moves once the loading bar is gone: sleep until the click
+        return 0 if self.preloader.finished else None
+
+    def draw(self, screen, alpha):
+        screen_width, screen_height = self.size
+        self.start_button_rect = draw_intro_screen(screen, screen_width, screen_height, self.background_image)
+        if not self.preloader.finished:
+            draw_loading_bar(screen, self.start_button_rect, self.preloader.progress)
 
-def initialize_game():
-    pygame.init()
-    pygame.mixer.init()
-
-    try:
-        pygame.mixer.music.load("./sound_effects/sonido_espacio.mp3")
-        pygame.mixer.music.play(-1)
-    except Exception as e:
-        print("Music load/play error:", e)
-
-    screen_width = 800
-    screen_height = 600
-
-    screen = pygame.display.set_mode((screen_width, screen_height))
-    pygame.display.set_caption("HELIOS: The Space Weather Game")
-
-    try:
-        background_image = pygame.image.load('levels/assets/images/helioss.jpg').convert()
-        background_image = pygame.transform.scale(background_image, (screen_width, screen_height))
-    except pygame.error as e:
-        background_image=None
-        
-    return screen, screen_width, screen_height, background_image
 
 def draw_intro_screen(screen, screen_width, screen_height, background_image):
 
@@ -37,11 +78,9 @@ def draw_intro_screen(screen, screen_width, screen_height, background_image):
     else:
         screen.fill(black)
 
-    font_large = pygame.font.Font(None, 80)
-    font_medium = pygame.font.Font(None, 40)
-    font_small = pygame.font.Font(None, 30)
+    font_small = get_font(None, 30)
 
-    start_text = font_small.render("Click to Start", True, black)
+    start_text = text_cache.render(font_small, "Click to Start", black)
         
     button_width = 200
     button_height = 50
@@ -53,28 +92,45 @@ def draw_intro_screen(screen, screen_width, screen_height, background_image):
     start_text_rect = start_text.get_rect(center=button_rect.center)
     screen.blit(start_text, start_text_rect)
 
-    pygame.display.flip()
     return button_rect
 
-def main():
-    screen, screen_width, screen_height, background_image = initialize_game()
-
-    start_button_rect = draw_intro_screen(screen, screen_width, screen_height, background_image)
-
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                
-                if start_button_rect.collidepoint(event.pos):
-                    
-                    running = False 
+def draw_loading_bar(screen, button_rect, progress):
+    bar_rect = pygame.Rect(0, 0, button_rect.width, 8)
+    bar_rect.midtop = (button_rect.centerx, button_rect.bottom + 12)
+    pygame.draw.rect(screen, (60, 60, 60), bar_rect)
+    pygame.draw.rect(screen, (200, 200, 200), (bar_rect.x, bar_rect.y, int(bar_rect.width * progress), bar_rect.height))
+    pygame.draw.rect(screen, (255, 255, 255), bar_rect, 1)
+
+def create_scenes():
+    """Every scene of the game, in play order (also used by the asset baker)."""
+    intro = IntroScene()
+    intro.next_scene = "lvl1"
+    level1 = lvl1.Lvl1Scene()
+    level1.next_scene = "lvl3"
+    return {"intro": intro, "lvl1": level1, "lvl3": lvl3.Lvl3Scene()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HELIOS: The Space Weather Game")
+    parser.add_argument("--record", metavar="PATH", help="Record this session for engine.replay")
+    parser.add_argument("--seed", type=int, help="Master random seed (random if omitted)")
+    args = parser.parse_args(argv)
+
+    seed = streams.reseed(args.seed)
+    recorder = None
+    input_source, sim = live_input, FixedStepLoop(TICK_RATE)
+    if args.record:
+        recorder = Recorder(args.record, seed, "intro", TICK_RATE)
+        input_source, sim = recorder.wrap_input(input_source), recorder.wrap_sim(sim)
+
+    # One window and mixer for the whole game; levels are scenes on top of it
+    manager = SceneManager(input_source=input_source, sim=sim, recorder=recorder)
+    for name, scene in create_scenes().items():
+        manager.add(name, scene)
+
+    manager.run("intro")
 
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()